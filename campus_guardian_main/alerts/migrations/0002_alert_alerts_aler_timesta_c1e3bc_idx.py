@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['timestamp'], name='alerts_aler_timesta_c1e3bc_idx'),
+        ),
+    ]
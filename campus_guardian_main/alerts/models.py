@@ -14,5 +14,10 @@ class Alert(models.Model):
     expiry = models.DateTimeField(blank=True, null=True)
     sender = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp']),
+        ]
+
     def __str__(self):
         return f"{self.type.upper()} - {self.message[:40]}"
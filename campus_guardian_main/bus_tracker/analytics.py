@@ -0,0 +1,136 @@
+import math
+from datetime import datetime, time as dt_time, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce, ExtractHour
+from django.utils import timezone
+
+from .models import Bus, Route, StopDayVersion, StopTime
+
+DEFAULT_ON_TIME_EARLY_MINUTES = 1
+DEFAULT_ON_TIME_LATE_MINUTES = 5
+DEFAULT_CACHE_SECONDS = 6 * 60 * 60
+MAX_PERIOD_DAYS = 366
+
+# Grouping key for each dimension the report can be broken down by
+DIMENSIONS = {
+    'route': F('schedule__route_id'),
+    'bus': F('schedule__bus_id'),
+    'stop': F('stop_name'),
+    'hour': ExtractHour('arrival_time'),
+}
+
+DELAY = ExpressionWrapper(F('actual_arrival_time') - F('arrival_time'), output_field=DurationField())
+
+
+def _bump_days(days):
+    StopDayVersion.objects.bulk_create([StopDayVersion(day=day) for day in days], ignore_conflicts=True)
+    StopDayVersion.objects.filter(day__in=days).update(version=F('version') + 1)
+
+
+def touch_stop_days(values):
+    """
+    Invalidate cached reports covering the days of ``values`` (dates or
+    datetimes of scheduled arrivals) once the current transaction commits.
+    Call after any StopTime write that bypasses the model signals.
+    """
+    days = {timezone.localdate(value) if isinstance(value, datetime) else value for value in values if value}
+    if days:
+        transaction.on_commit(lambda: _bump_days(sorted(days)))
+
+
+def _period_version(start, end):
+    # Versions only grow, so their sum changes whenever any day of the period does.
+    # They live in the database, so every process sees the same value.
+    return StopDayVersion.objects.filter(day__gte=start, day__lte=end).aggregate(
+        version=Coalesce(Sum('version'), 0)
+    )['version']
+
+
+def _labels(dimension, keys):
+    if dimension == 'route':
+        return dict(Route.objects.filter(pk__in=keys).values_list('pk', 'name'))
+    if dimension == 'bus':
+        return dict(Bus.objects.filter(pk__in=keys).values_list('pk', 'plate_number'))
+    return {key: key for key in keys}
+
+
+def _minutes(delay):
+    return round(delay.total_seconds() / 60, 1) if delay is not None else None
+
+
+def on_time_performance(start, end, dimension='route'):
+    """
+    On-time statistics for stops scheduled from ``start`` to ``end`` (dates,
+    inclusive), grouped by ``dimension`` (route, bus, stop or hour).
+
+    Counts and mean delay are aggregated by the database. The p95 delay is
+    read in one pass over the arrived stops sorted by (group, delay). Results
+    are cached until a stop on one of the period's days changes.
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+
+    cache_key = f'bus_tracker:ontime:{dimension}:{start}:{end}:{_period_version(start, end)}'
+    report = cache.get(cache_key)
+    if report is not None:
+        return report
+
+    early = timedelta(minutes=getattr(settings, 'ON_TIME_EARLY_MINUTES', DEFAULT_ON_TIME_EARLY_MINUTES))
+    late = timedelta(minutes=getattr(settings, 'ON_TIME_LATE_MINUTES', DEFAULT_ON_TIME_LATE_MINUTES))
+    arrived = Q(actual_arrival_time__isnull=False)
+
+    stops = StopTime.objects.filter(
+        arrival_time__gte=timezone.make_aware(datetime.combine(start, dt_time.min)),
+        arrival_time__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min)),
+    ).annotate(group=DIMENSIONS[dimension])
+
+    rows = (
+        stops.values('group')
+        .annotate(
+            scheduled=Count('pk'),
+            arrived=Count('pk', filter=arrived),
+            on_time=Count('pk', filter=arrived & Q(
+                actual_arrival_time__gte=F('arrival_time') - early,
+                actual_arrival_time__lte=F('arrival_time') + late,
+            )),
+            skipped=Count('pk', filter=Q(stop_status='skipped')),
+            mean_delay=Avg(DELAY, filter=arrived),
+        )
+        .order_by('group')
+    )
+    groups = {row['group']: row for row in rows}
+
+    # p95: the delay at rank ceil(0.95 * n) within each group, read in one sorted pass
+    delays = (
+        stops.filter(arrived).annotate(delay=DELAY)
+        .order_by('group', 'delay').values_list('group', 'delay')
+    )
+    for group, group_delays in groupby(delays.iterator(chunk_size=5000), key=lambda row: row[0]):
+        rank = math.ceil(0.95 * groups[group]['arrived'])
+        for position, (_, delay) in enumerate(group_delays, start=1):
+            if position == rank:
+                groups[group]['p95_delay'] = delay
+                break
+
+    labels = _labels(dimension, list(groups))
+    report = [
+        {
+            "key": group,
+            "label": labels.get(group, group),
+            "scheduled": row['scheduled'],
+            "arrived": row['arrived'],
+            "on_time": row['on_time'],
+            "skipped": row['skipped'],
+            "on_time_pct": round(100 * row['on_time'] / row['arrived'], 1) if row['arrived'] else None,
+            "mean_delay_minutes": _minutes(row['mean_delay']),
+            "p95_delay_minutes": _minutes(row.get('p95_delay')),
+        }
+        for group, row in groups.items()
+    ]
+    cache.set(cache_key, report, getattr(settings, 'ON_TIME_CACHE_SECONDS', DEFAULT_CACHE_SECONDS))
+    return report
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BusTrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'campus_guardian_main.bus_tracker'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,179 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+
+from .analytics import touch_stop_days
+from .geo import haversine_m
+from .models import ChangeLog, RouteStop, Schedule, StopTime
+from .sync import record_changes
+
+DEFAULT_RADIUS_M = 50
+DEFAULT_LOOKAHEAD = 3
+DEFAULT_INDEX_TTL_SECONDS = 60
+DEFAULT_SCHEDULE_GRACE_MINUTES = 30
+
+
+class ScheduleStopIndex:
+    """
+    Upcoming stops of the schedule a bus is running, with coordinates.
+
+    ``stops`` holds ``[stop_time_id, latitude, longitude, arrival_time]`` in arrival order;
+    matched stops are popped so each fix only looks at the next few stops.
+    """
+
+    def __init__(self, schedule_id, starts_at, ends_at, stops, expires_at):
+        self.schedule_id = schedule_id
+        self.starts_at = starts_at
+        self.ends_at = ends_at
+        self.stops = stops
+        self.expires_at = expires_at
+
+    def covers(self, timestamp):
+        return timestamp < self.expires_at and (
+            self.schedule_id is None or self.starts_at <= timestamp <= self.ends_at
+        )
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _build_indexes(bus_ids, start, end, built_at):
+    """
+    Load the trip each bus is running, its upcoming stops and their
+    coordinates in three queries.
+    """
+    grace = timedelta(minutes=getattr(settings, 'STOP_MATCH_SCHEDULE_GRACE_MINUTES', DEFAULT_SCHEDULE_GRACE_MINUTES))
+    ttl = timedelta(seconds=getattr(settings, 'STOP_INDEX_TTL_SECONDS', DEFAULT_INDEX_TTL_SECONDS))
+
+    schedules = list(
+        Schedule.objects.filter(
+            bus_id__in=bus_ids,
+            departure_time__lte=end + grace,
+            arrival_time__gte=start - grace,
+        )
+        .order_by('bus_id', 'departure_time', 'pk')
+    )
+
+    stops_by_schedule = {schedule.pk: [] for schedule in schedules}
+    upcoming = (
+        StopTime.objects.filter(
+            schedule_id__in=stops_by_schedule,
+            stop_status='upcoming',
+            actual_arrival_time__isnull=True,
+        )
+        .order_by('arrival_time', 'pk')
+        .values_list('pk', 'schedule_id', 'stop_name', 'arrival_time')
+    )
+    coordinates = {}
+    for route_id, name, latitude, longitude in RouteStop.objects.filter(
+        route_id__in={schedule.route_id for schedule in schedules},
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).values_list('route_id', 'name', 'latitude', 'longitude'):
+        coordinates[(route_id, name)] = (latitude, longitude)
+
+    route_ids = {schedule.pk: schedule.route_id for schedule in schedules}
+    for stop_time_id, schedule_id, stop_name, arrival_time in upcoming:
+        location = coordinates.get((route_ids[schedule_id], stop_name))
+        if location:
+            stops_by_schedule[schedule_id].append([stop_time_id, location[0], location[1], arrival_time])
+
+    by_bus = {}
+    for schedule in schedules:
+        by_bus.setdefault(schedule.bus_id, []).append(schedule)
+
+    indexes = {}
+    for bus_id in bus_ids:
+        trips = by_bus.get(bus_id, [])
+        # Back to back trips overlap once widened by the grace period: take the
+        # latest one running at the start of the batch, preferring one with stops left
+        running = [trip for trip in trips if trip.departure_time - grace <= start <= trip.arrival_time + grace]
+        if running:
+            schedule = max(running, key=lambda trip: (bool(stops_by_schedule[trip.pk]), trip.departure_time))
+        else:
+            schedule = trips[0] if trips else None
+
+        if schedule is None:
+            indexes[bus_id] = ScheduleStopIndex(None, None, None, [], built_at + ttl)
+            continue
+
+        # Hand over to the next trip as soon as its window opens
+        ends_at = schedule.arrival_time + grace
+        for trip in trips:
+            if trip.departure_time > schedule.departure_time and start < trip.departure_time - grace < ends_at:
+                ends_at = trip.departure_time - grace
+                break
+        indexes[bus_id] = ScheduleStopIndex(
+            schedule.pk,
+            schedule.departure_time - grace,
+            ends_at,
+            stops_by_schedule[schedule.pk],
+            built_at + ttl,
+        )
+    return indexes
+
+
+def detect_arrivals(logs):
+    """
+    Mark StopTimes as arrived when a bus comes within ``STOP_ARRIVAL_RADIUS_M``
+    of one of its next ``STOP_MATCH_LOOKAHEAD`` stops. Candidate stops come
+    from the per-bus in-memory index; matched stops are saved with one
+    bulk_update. Returns the number of stops marked arrived.
+    """
+    if not logs:
+        return 0
+
+    radius = getattr(settings, 'STOP_ARRIVAL_RADIUS_M', DEFAULT_RADIUS_M)
+    lookahead = getattr(settings, 'STOP_MATCH_LOOKAHEAD', DEFAULT_LOOKAHEAD)
+    logs = sorted(logs, key=lambda log: log.timestamp)
+
+    with _lock:
+        stale = {
+            log.bus_id for log in logs
+            if log.bus_id not in _indexes or not _indexes[log.bus_id].covers(log.timestamp)
+        }
+        if stale:
+            _indexes.update(_build_indexes(stale, logs[0].timestamp, logs[-1].timestamp, logs[-1].timestamp))
+
+        arrivals, schedule_ids = {}, set()
+        for log in logs:
+            index = _indexes.get(log.bus_id)
+            if index is None or not index.stops:
+                continue
+            for position, (stop_time_id, latitude, longitude, arrival_time) in enumerate(index.stops[:lookahead]):
+                if haversine_m(log.latitude, log.longitude, latitude, longitude) <= radius:
+                    arrivals[stop_time_id] = (log.timestamp, arrival_time)
+                    schedule_ids.add(index.schedule_id)
+                    del index.stops[position]
+                    break
+
+    if not arrivals:
+        return 0
+
+    stop_times = [
+        StopTime(pk=stop_time_id, actual_arrival_time=arrived_at, stop_status='arrived')
+        for stop_time_id, (arrived_at, _) in arrivals.items()
+    ]
+    StopTime.objects.bulk_update(stop_times, ['actual_arrival_time', 'stop_status'])
+    touch_stop_days(arrival_time for _, arrival_time in arrivals.values())
+    record_changes(ChangeLog.SCHEDULE, schedule_ids)
+    return len(stop_times)
+
+
+def reset_indexes(bus_ids=None, schedule_ids=None):
+    """
+    Drop cached stop indexes after a timetable or route stop edit. With no arguments every
+    index is dropped; they are rebuilt on the next fix.
+    """
+    with _lock:
+        if bus_ids is None and schedule_ids is None:
+            _indexes.clear()
+            return
+        bus_ids, schedule_ids = set(bus_ids or ()), set(schedule_ids or ())
+        for bus_id in [
+            bus_id for bus_id, index in _indexes.items()
+            if bus_id in bus_ids or index.schedule_id in schedule_ids
+        ]:
+            del _indexes[bus_id]
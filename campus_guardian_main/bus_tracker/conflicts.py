@@ -0,0 +1,139 @@
+import heapq
+from itertools import groupby
+
+from .models import Driver, Schedule
+
+
+class Trip:
+    """A bus booked from ``departure_time`` to ``arrival_time``. ``pk`` is None for unsaved trips."""
+
+    __slots__ = ('pk', 'bus_id', 'departure_time', 'arrival_time')
+
+    def __init__(self, pk, bus_id, departure_time, arrival_time):
+        self.pk = pk
+        self.bus_id = bus_id
+        self.departure_time = departure_time
+        self.arrival_time = arrival_time
+
+    @classmethod
+    def from_schedule(cls, schedule):
+        return cls(schedule.pk, schedule.bus_id, schedule.departure_time, schedule.arrival_time)
+
+    def as_dict(self):
+        return {"id": self.pk, "departure_time": self.departure_time, "arrival_time": self.arrival_time}
+
+
+def sweep_conflicts(trips):
+    """
+    Every overlapping pair among ``trips``, which must be sorted by (bus_id,
+    departure_time). Each bus is swept once while keeping the trips still
+    running in a heap ordered by arrival time, so the cost grows with the
+    number of trips plus the number of overlaps. Trips that merely touch
+    (one arrives as the next departs) don't conflict. Yields ``(earlier,
+    later)`` pairs.
+    """
+    for _, bus_trips in groupby(trips, key=lambda trip: trip.bus_id):
+        running = []
+        for order, trip in enumerate(bus_trips):
+            while running and running[0][0] <= trip.departure_time:
+                heapq.heappop(running)
+            for _, _, earlier in sorted(running, key=lambda entry: entry[1]):
+                yield earlier, trip
+            heapq.heappush(running, (trip.arrival_time, order, trip))
+
+
+def _booked_trips(bus_ids, start, end, exclude_ids=()):
+    schedules = Schedule.objects.filter(departure_time__lt=end, arrival_time__gt=start)
+    if bus_ids is not None:
+        schedules = schedules.filter(bus_id__in=bus_ids)
+    if exclude_ids:
+        schedules = schedules.exclude(pk__in=exclude_ids)
+    return [
+        Trip(*row)
+        for row in schedules.order_by('bus_id', 'departure_time', 'pk').values_list(
+            'pk', 'bus_id', 'departure_time', 'arrival_time'
+        )
+    ]
+
+
+def find_conflicts(candidates):
+    """
+    Check new or edited trips against every booked trip of the same buses,
+    loaded with one range query, and against each other. A candidate that
+    overlaps a booked trip is always in conflict. Of two overlapping
+    candidates the earlier one is kept and only the later one is reported,
+    so a batch keeps as many trips as booking them one by one would.
+    Returns ``(candidate, other)`` pairs, one per rejected candidate.
+    """
+    if not candidates:
+        return []
+
+    candidates = list(candidates)
+    start = min(trip.departure_time for trip in candidates)
+    end = max(trip.arrival_time for trip in candidates)
+    trips = _booked_trips(
+        {trip.bus_id for trip in candidates}, start, end,
+        exclude_ids=[trip.pk for trip in candidates if trip.pk is not None],
+    )
+    trips.extend(candidates)
+    trips.sort(key=lambda trip: (trip.bus_id, trip.departure_time))
+
+    candidate_ids = {id(trip) for trip in candidates}
+    conflicts = {}
+
+    # Against booked trips: candidates still open when a booked trip departs overlap it
+    for _, bus_trips in groupby(trips, key=lambda trip: trip.bus_id):
+        latest_booked, open_candidates = None, []
+        for trip in bus_trips:
+            if id(trip) in candidate_ids:
+                if latest_booked is not None and trip.departure_time < latest_booked.arrival_time:
+                    conflicts[id(trip)] = (trip, latest_booked)
+                else:
+                    open_candidates.append(trip)
+                continue
+            for candidate in open_candidates:
+                if candidate.arrival_time > trip.departure_time:
+                    conflicts[id(candidate)] = (candidate, trip)
+            open_candidates = []
+            if latest_booked is None or trip.arrival_time > latest_booked.arrival_time:
+                latest_booked = trip
+
+    # Against each other: first come, first served among the remaining candidates
+    remaining = [trip for trip in trips if id(trip) in candidate_ids and id(trip) not in conflicts]
+    for _, bus_trips in groupby(remaining, key=lambda trip: trip.bus_id):
+        latest = None
+        for trip in bus_trips:
+            if latest is not None and trip.departure_time < latest.arrival_time:
+                conflicts[id(trip)] = (trip, latest)
+            else:
+                latest = trip
+
+    return [conflicts[id(trip)] for trip in candidates if id(trip) in conflicts]
+
+
+def conflict_report(start, end):
+    """
+    Every double-booked pair of trips running between ``start`` and ``end``,
+    with the drivers assigned to the bus. Drivers follow their assigned bus,
+    so a bus conflict is also a conflict for each of its drivers. One range
+    query and one sweep.
+    """
+    trips = _booked_trips(None, start, end)
+    pairs = list(sweep_conflicts(trips))
+
+    drivers = {}
+    if pairs:
+        for driver_id, bus_id in Driver.objects.filter(
+            assigned_bus_id__in={earlier.bus_id for earlier, _ in pairs}
+        ).order_by('pk').values_list('pk', 'assigned_bus_id'):
+            drivers.setdefault(bus_id, []).append(driver_id)
+
+    return [
+        {
+            "bus_id": earlier.bus_id,
+            "driver_ids": drivers.get(earlier.bus_id, []),
+            "first": earlier.as_dict(),
+            "second": later.as_dict(),
+        }
+        for earlier, later in pairs
+    ]
@@ -0,0 +1,51 @@
+from django_cron import CronJobBase, Schedule
+
+from .eta import refresh_delay_stats
+from .retention import compact_gps_logs
+from .sweeper import sweep_stop_statuses
+from .sync import prune_change_log
+
+
+class GPSLogCompaction(CronJobBase):
+    RUN_AT_TIMES = ['03:00']
+
+    schedule = Schedule(run_at_times=RUN_AT_TIMES)
+    code = 'bus_tracker.gpslog_compaction'
+
+    def do(self):
+        report = compact_gps_logs()
+        return (
+            f"Compacted {report['rows_compacted']} GPS logs older than {report['cutoff']:%Y-%m-%d %H:%M} "
+            f"into {report['points_written']} track points, ~{report['bytes_reclaimed']} bytes reclaimed"
+        )
+
+
+class StopDelayStatsRefresh(CronJobBase):
+    RUN_AT_TIMES = ['01:30']
+
+    schedule = Schedule(run_at_times=RUN_AT_TIMES)
+    code = 'bus_tracker.stop_delay_stats_refresh'
+
+    def do(self):
+        return f"Refreshed {refresh_delay_stats()} stop delay statistics"
+
+
+class StopStatusSweep(CronJobBase):
+    RUN_EVERY_MINS = 5
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'bus_tracker.stop_status_sweep'
+
+    def do(self):
+        skipped, arrived = sweep_stop_statuses()
+        return f"Marked {skipped} stops skipped and {arrived} stops arrived"
+
+
+class ChangeLogPrune(CronJobBase):
+    RUN_AT_TIMES = ['03:30']
+
+    schedule = Schedule(run_at_times=RUN_AT_TIMES)
+    code = 'bus_tracker.change_log_prune'
+
+    def do(self):
+        return f"Pruned {prune_change_log()} sync change log rows"
@@ -0,0 +1,131 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import StopDelayStat, StopTime
+
+DEFAULT_HISTORY_DAYS = 60
+DEFAULT_MIN_SAMPLES = 3
+DEFAULT_MAX_DELAY_MINUTES = 60
+DEFAULT_TABLE_RELOAD_SECONDS = 15 * 60
+HISTORY_CHUNK_SIZE = 5000
+
+
+def refresh_delay_stats(now=None):
+    """
+    Rebuild StopDelayStat from the arrivals of the last ``ETA_HISTORY_DAYS``.
+
+    History is streamed once in chunks and folded into per (route, stop, hour)
+    sums; delays are clipped to ``ETA_MAX_DELAY_MINUTES`` so a bus that broke
+    down doesn't skew a bucket for weeks. Returns the number of rows written.
+    """
+    now = now or timezone.now()
+    history_days = getattr(settings, 'ETA_HISTORY_DAYS', DEFAULT_HISTORY_DAYS)
+    limit = getattr(settings, 'ETA_MAX_DELAY_MINUTES', DEFAULT_MAX_DELAY_MINUTES) * 60
+
+    history = (
+        StopTime.objects.filter(
+            actual_arrival_time__isnull=False,
+            arrival_time__gte=now - timedelta(days=history_days),
+            arrival_time__lte=now,
+        )
+        .order_by()
+        .values_list('schedule__route_id', 'stop_name', 'arrival_time', 'actual_arrival_time')
+    )
+    buckets = {}
+    for route_id, stop_name, arrival_time, actual_arrival_time in history.iterator(chunk_size=HISTORY_CHUNK_SIZE):
+        delay = max(-limit, min(limit, (actual_arrival_time - arrival_time).total_seconds()))
+        key = (route_id, stop_name, timezone.localtime(arrival_time).hour)
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [1, delay]
+        else:
+            bucket[0] += 1
+            bucket[1] += delay
+
+    stats = [
+        StopDelayStat(
+            route_id=route_id, stop_name=stop_name, hour=hour,
+            samples=samples, mean_delay_seconds=round(total / samples), computed_at=now,
+        )
+        for (route_id, stop_name, hour), (samples, total) in buckets.items()
+    ]
+    with transaction.atomic():
+        StopDelayStat.objects.all().delete()
+        StopDelayStat.objects.bulk_create(stats, batch_size=1000)
+
+    reset_delay_table()
+    return len(stats)
+
+
+class DelayTable:
+    """
+    StopDelayStat held in memory for O(1) lookups. Buckets with fewer than
+    ``min_samples`` fall back to the stop's average over all hours.
+    """
+
+    def __init__(self, rows, min_samples=DEFAULT_MIN_SAMPLES):
+        self.by_hour = {}
+        totals = {}
+        for route_id, stop_name, hour, samples, mean_delay in rows:
+            if samples >= min_samples:
+                self.by_hour[(route_id, stop_name, hour)] = mean_delay
+            total = totals.setdefault((route_id, stop_name), [0, 0])
+            total[0] += samples
+            total[1] += samples * mean_delay
+        self.by_stop = {
+            key: round(total / samples) for key, (samples, total) in totals.items() if samples >= min_samples
+        }
+
+    def delay_seconds(self, route_id, stop_name, hour):
+        delay = self.by_hour.get((route_id, stop_name, hour))
+        if delay is None:
+            delay = self.by_stop.get((route_id, stop_name))
+        return delay
+
+
+_table = None
+_table_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def get_delay_table():
+    """The delay table, reloaded from the database every ``ETA_TABLE_RELOAD_SECONDS``."""
+    global _table, _table_loaded_at
+    reload_after = getattr(settings, 'ETA_TABLE_RELOAD_SECONDS', DEFAULT_TABLE_RELOAD_SECONDS)
+    if _table is None or time.monotonic() - _table_loaded_at > reload_after:
+        with _lock:
+            if _table is None or time.monotonic() - _table_loaded_at > reload_after:
+                _table = DelayTable(
+                    StopDelayStat.objects.values_list(
+                        'route_id', 'stop_name', 'hour', 'samples', 'mean_delay_seconds'
+                    ),
+                    getattr(settings, 'ETA_MIN_SAMPLES', DEFAULT_MIN_SAMPLES),
+                )
+                _table_loaded_at = time.monotonic()
+    return _table
+
+
+def reset_delay_table():
+    global _table
+    _table = None
+
+
+def predict_arrival(route_id, stop_time):
+    """
+    Predicted arrival for an upcoming stop: its scheduled time plus the
+    historical delay for that route, stop and hour. None once the stop has
+    been reached or skipped, or when there is no history for it.
+    """
+    if stop_time.actual_arrival_time or stop_time.stop_status != 'upcoming':
+        return None
+    delay = get_delay_table().delay_seconds(
+        route_id, stop_time.stop_name, timezone.localtime(stop_time.arrival_time).hour
+    )
+    if delay is None:
+        return None
+    return stop_time.arrival_time + timedelta(seconds=delay)
@@ -0,0 +1,154 @@
+"""
+Columnar binary export of a bus's GPS history.
+
+Layout (all integers and floats little-endian, every array 8-byte aligned)::
+
+    header  16 bytes  b'CGGPS' + version (u8) + 2 reserved bytes + bus id (i64)
+    block   repeated until a block with count 0:
+            count      u32 + 4 reserved bytes
+            latitude   count x f64
+            longitude  count x f64
+            timestamp  count x i64, microseconds since the Unix epoch (UTC)
+            log_type   count x u8, 0 = entry, 1 = exit, padded to 8 bytes
+
+Blocks let the export stream with flat memory; each column inside a block
+is contiguous, so a loader can map it straight into typed arrays.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from .models import GPSLog
+from .retention import track_points
+
+MAGIC = b'CGGPS'
+VERSION = 1
+HEADER = struct.Struct('<5sB2xq')
+BLOCK_HEADER = struct.Struct('<I4x')
+DEFAULT_BLOCK_ROWS = 8192
+
+LOG_TYPE_CODES = {GPSLog.ENTRY: 0, GPSLog.EXIT: 1}
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padding(size):
+    return b'\0' * (-size % 8)
+
+
+def _encode_block(latitudes, longitudes, timestamps, log_types):
+    return b''.join((
+        BLOCK_HEADER.pack(len(latitudes)),
+        _little_endian(latitudes),
+        _little_endian(longitudes),
+        _little_endian(timestamps),
+        log_types.tobytes(),
+        _padding(len(log_types)),
+    ))
+
+
+def iter_gps_export(bus_id, start, end, block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Yield the export of ``bus_id`` between ``start`` and ``end`` as byte
+    chunks, one per block of ``block_rows`` fixes. Raw and compacted history
+    are both streamed from the database, so memory use doesn't grow with the
+    range.
+    """
+    yield HEADER.pack(MAGIC, VERSION, bus_id)
+
+    columns = array('d'), array('d'), array('q'), array('B')
+    for timestamp, latitude, longitude, log_type in track_points(bus_id, start, end):
+        latitudes, longitudes, timestamps, log_types = columns
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+        timestamps.append((timestamp - EPOCH) // _MICROSECOND)
+        log_types.append(LOG_TYPE_CODES.get(log_type, 0))
+        if len(latitudes) >= block_rows:
+            yield _encode_block(*columns)
+            columns = array('d'), array('d'), array('q'), array('B')
+
+    if columns[0]:
+        yield _encode_block(*columns)
+    yield BLOCK_HEADER.pack(0)
+
+
+class GPSExportBlock:
+    """One block of an export. Columns are zero-copy memoryviews over the mapped file."""
+
+    def __init__(self, latitude, longitude, timestamp, log_type):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timestamp = timestamp
+        self.log_type = log_type
+
+    def __len__(self):
+        return len(self.latitude)
+
+
+class GPSExport:
+    """
+    Memory-mapped export file. Columns are exposed without copying, e.g.
+    ``numpy.frombuffer(block.latitude, dtype='<f8')`` for each block.
+    Use as a context manager, or call ``close()`` once the views are no
+    longer needed.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self.blocks = []
+
+        magic, version, self.bus_id = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Not a GPS export file")
+
+        offset = HEADER.size
+        while True:
+            (count,) = BLOCK_HEADER.unpack_from(self._view, offset)
+            offset += BLOCK_HEADER.size
+            if not count:
+                break
+            self.blocks.append(GPSExportBlock(
+                self._column(offset, count, 'd'),
+                self._column(offset + 8 * count, count, 'd'),
+                self._column(offset + 16 * count, count, 'q'),
+                self._view[offset + 24 * count:offset + 25 * count],
+            ))
+            offset += 25 * count + len(_padding(count))
+
+    def _column(self, offset, count, code):
+        if sys.byteorder == 'big':
+            raise ValueError("Zero-copy loading needs a little-endian host")
+        return self._view[offset:offset + 8 * count].cast(code)
+
+    def __len__(self):
+        return sum(len(block) for block in self.blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for block in self.blocks:
+            for column in (block.latitude, block.longitude, block.timestamp, block.log_type):
+                column.release()
+        self.blocks = []
+        self._view.release()
+        self._map.close()
+
+
+def load_gps_export(path):
+    """Memory-map an export written by ``iter_gps_export``."""
+    return GPSExport(path)
@@ -0,0 +1,138 @@
+from math import asin, cos, radians, sin, sqrt
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres between two points."""
+    lat1, lng1, lat2, lng2 = map(radians, (lat1, lng1, lat2, lng2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * asin(min(1.0, sqrt(a)))
+
+
+def path_length_m(latitudes, longitudes):
+    """Total haversine length in metres of the path through the given points."""
+    return sum(map(haversine_m, latitudes, longitudes, latitudes[1:], longitudes[1:]))
+
+
+def simplify(latitudes, longitudes, tolerance_m):
+    """
+    Douglas–Peucker simplification. Returns the indices of the points to keep
+    so that no dropped point is further than ``tolerance_m`` from the
+    simplified path. Distances are measured on a local equirectangular
+    projection, which is accurate at the scale of a campus route.
+    """
+    count = len(latitudes)
+    if count < 3 or tolerance_m <= 0:
+        return list(range(count))
+
+    scale_x = radians(1) * EARTH_RADIUS_M * cos(radians(sum(latitudes) / count))
+    scale_y = radians(1) * EARTH_RADIUS_M
+    xs = [lng * scale_x for lng in longitudes]
+    ys = [lat * scale_y for lat in latitudes]
+    tolerance_sq = tolerance_m * tolerance_m
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1, x2, y2 = xs[first], ys[first], xs[last], ys[last]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+
+        farthest, farthest_sq = None, tolerance_sq
+        for index in range(first + 1, last):
+            px, py = xs[index] - x1, ys[index] - y1
+            if length_sq:
+                t = max(0.0, min(1.0, (px * dx + py * dy) / length_sq))
+                px, py = px - t * dx, py - t * dy
+            distance_sq = px * px + py * py
+            if distance_sq > farthest_sq:
+                farthest, farthest_sq = index, distance_sq
+
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [index for index, kept in enumerate(keep) if kept]
+
+
+def encode_polyline(latitudes, longitudes, precision=5):
+    """Encode points in the Google encoded polyline format."""
+    factor = 10 ** precision
+    chunks = []
+    previous_lat = previous_lng = 0
+    for lat, lng in zip(latitudes, longitudes):
+        lat, lng = round(lat * factor), round(lng * factor)
+        for delta in (lat - previous_lat, lng - previous_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        previous_lat, previous_lng = lat, lng
+    return ''.join(chunks)
+
+
+METRES_PER_DEGREE = radians(1) * EARTH_RADIUS_M
+
+
+class GridIndex:
+    """
+    Points keyed by id, bucketed into uniform latitude/longitude cells of
+    about ``cell_size_m`` so a radius query only looks at nearby cells.
+    Each id holds one point; updating it moves it between cells.
+    """
+
+    def __init__(self, cell_size_m):
+        self.cell_degrees = cell_size_m / METRES_PER_DEGREE
+        self.cells = {}
+        self.points = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, lat, lng):
+        return int(lat // self.cell_degrees), int(lng // self.cell_degrees)
+
+    def update(self, key, lat, lng, value=None):
+        cell = self._cell(lat, lng)
+        current = self.points.get(key)
+        if current is not None and current[0] != cell:
+            members = self.cells[current[0]]
+            members.discard(key)
+            if not members:
+                del self.cells[current[0]]
+        self.cells.setdefault(cell, set()).add(key)
+        self.points[key] = (cell, lat, lng, value)
+
+    def within(self, lat, lng, radius_m):
+        """``(distance_m, key, value)`` for every point within ``radius_m``, nearest first."""
+        lat_span = radius_m / METRES_PER_DEGREE
+        lng_span = lat_span / max(cos(radians(lat)), 1e-6)
+        min_row, min_col = self._cell(lat - lat_span, lng - lng_span)
+        max_row, max_col = self._cell(lat + lat_span, lng + lng_span)
+
+        candidates = []
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.cells):
+            # Huge radius: walking the occupied cells is cheaper than the box
+            for (row, col), members in self.cells.items():
+                if min_row <= row <= max_row and min_col <= col <= max_col:
+                    candidates.extend(members)
+        else:
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    candidates.extend(self.cells.get((row, col), ()))
+        if not candidates:
+            return []
+
+        points = [self.points[key] for key in candidates]
+        distances = map(haversine_m, [lat] * len(points), [lng] * len(points),
+                        [point[1] for point in points], [point[2] for point in points])
+        return sorted(
+            (distance, key, point[3])
+            for distance, key, point in zip(distances, candidates, points)
+            if distance <= radius_m
+        )
@@ -0,0 +1,151 @@
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .models import Bus, ChangeLog, GPSLog
+from .sync import record_changes
+
+IN_CAMPUS = 'in_campus'
+OUT_CAMPUS = 'out_campus'
+
+DEFAULT_BANDS = 32
+DEFAULT_CONFIRM_FIXES = 2
+
+
+class GeofencePolygon:
+    """
+    A campus boundary as a list of ``(latitude, longitude)`` vertices.
+
+    Edges are bucketed into horizontal latitude bands so a point test only
+    ray-casts against the few edges that cross the point's band, after a
+    bounding-box reject.
+    """
+
+    def __init__(self, vertices, bands=DEFAULT_BANDS):
+        if len(vertices) < 3:
+            raise ValueError("A geofence polygon needs at least 3 vertices")
+        vertices = [(float(lat), float(lng)) for lat, lng in vertices]
+        lats = [lat for lat, _ in vertices]
+        lngs = [lng for _, lng in vertices]
+        self.min_lat, self.max_lat = min(lats), max(lats)
+        self.min_lng, self.max_lng = min(lngs), max(lngs)
+
+        self.band_count = bands
+        self.band_height = ((self.max_lat - self.min_lat) / bands) or 1.0
+        self.bands = [[] for _ in range(bands)]
+        for index, start in enumerate(vertices):
+            end = vertices[(index + 1) % len(vertices)]
+            if start[0] == end[0]:
+                continue  # horizontal edges never cross a horizontal ray
+            low, high = sorted((start[0], end[0]))
+            for band in range(self._band(low), self._band(high) + 1):
+                self.bands[band].append((start, end))
+
+    def _band(self, lat):
+        return min(self.band_count - 1, max(0, int((lat - self.min_lat) / self.band_height)))
+
+    def contains(self, lat, lng):
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return False
+        inside = False
+        for (lat1, lng1), (lat2, lng2) in self.bands[self._band(lat)]:
+            if (lat1 > lat) != (lat2 > lat):
+                crossing = lng1 + (lat - lat1) * (lng2 - lng1) / (lat2 - lat1)
+                if lng < crossing:
+                    inside = not inside
+        return inside
+
+
+class Geofence:
+    """All campus polygons from ``settings.CAMPUS_GEOFENCES``."""
+
+    def __init__(self, polygons, bands=DEFAULT_BANDS):
+        self.polygons = [GeofencePolygon(polygon, bands) for polygon in polygons]
+        if self.polygons:
+            self.min_lat = min(polygon.min_lat for polygon in self.polygons)
+            self.max_lat = max(polygon.max_lat for polygon in self.polygons)
+            self.min_lng = min(polygon.min_lng for polygon in self.polygons)
+            self.max_lng = max(polygon.max_lng for polygon in self.polygons)
+
+    def __bool__(self):
+        return bool(self.polygons)
+
+    def contains(self, lat, lng):
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return False
+        return any(polygon.contains(lat, lng) for polygon in self.polygons)
+
+
+_geofence = None
+_lock = threading.Lock()
+
+# Fixes seen on the far side of the boundary, per bus, awaiting confirmation
+_pending_flips = {}
+
+
+def get_geofence():
+    global _geofence
+    if _geofence is None:
+        with _lock:
+            if _geofence is None:
+                _geofence = Geofence(
+                    getattr(settings, 'CAMPUS_GEOFENCES', []),
+                    getattr(settings, 'GEOFENCE_BANDS', DEFAULT_BANDS),
+                )
+    return _geofence
+
+
+@receiver(setting_changed)
+def _reset_geofence(setting, **kwargs):
+    global _geofence
+    if setting in ('CAMPUS_GEOFENCES', 'GEOFENCE_BANDS', 'GEOFENCE_CONFIRM_FIXES'):
+        _geofence = None
+        _pending_flips.clear()
+
+
+def apply_geofence(logs, statuses=None):
+    """
+    Derive ``log_type`` for each log from its coordinates and update
+    ``Bus.location_status`` for buses that crossed the boundary.
+
+    A bus only changes side after ``GEOFENCE_CONFIRM_FIXES`` consecutive fixes
+    on the other side, so jitter along the fence doesn't make it flap.
+    ``statuses`` maps bus id to its current location_status; it is loaded
+    with one query when not given. Does nothing if no geofence is configured.
+    """
+    geofence = get_geofence()
+    if not geofence or not logs:
+        return
+
+    confirm_fixes = getattr(settings, 'GEOFENCE_CONFIRM_FIXES', DEFAULT_CONFIRM_FIXES)
+    if statuses is None:
+        statuses = dict(
+            Bus.objects.filter(pk__in={log.bus_id for log in logs}).values_list('pk', 'location_status')
+        )
+    initial = dict(statuses)
+    current = dict(statuses)
+
+    for log in sorted(logs, key=lambda log: log.timestamp):
+        side = IN_CAMPUS if geofence.contains(log.latitude, log.longitude) else OUT_CAMPUS
+        confirmed = current.get(log.bus_id, IN_CAMPUS)
+
+        if side == confirmed:
+            _pending_flips.pop(log.bus_id, None)
+        else:
+            pending_side, seen = _pending_flips.get(log.bus_id, (side, 0))
+            seen = seen + 1 if pending_side == side else 1
+            if seen >= confirm_fixes:
+                confirmed = current[log.bus_id] = side
+                _pending_flips.pop(log.bus_id, None)
+            else:
+                _pending_flips[log.bus_id] = (side, seen)
+
+        log.log_type = GPSLog.ENTRY if confirmed == IN_CAMPUS else GPSLog.EXIT
+
+    for status in (IN_CAMPUS, OUT_CAMPUS):
+        changed = [bus_id for bus_id, value in current.items() if value == status and initial.get(bus_id) != status]
+        if changed:
+            Bus.objects.filter(pk__in=changed).update(location_status=status)
+            record_changes(ChangeLog.BUS, changed)
@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .geo import haversine_m
+from .live import get_backend
+
+DEFAULT_MAX_SPEED_KMH = 120
+DEFAULT_JITTER_M = 10
+DEFAULT_KEEPALIVE_SECONDS = 60
+DEFAULT_MAX_FUTURE_SECONDS = 5 * 60
+DEFAULT_CACHE_SIZE = 1024
+
+
+class LastFixCache:
+    """
+    Last accepted ``(timestamp, latitude, longitude)`` per bus, least recently
+    used buses evicted beyond ``max_size``. Misses are seeded from the live
+    position store, so a restart doesn't let the first fix through unchecked.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._fixes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def load(self, bus_ids, latest):
+        missing = [bus_id for bus_id in bus_ids if bus_id not in self._fixes]
+        if missing:
+            for bus_id, position in get_backend().get_many(missing).items():
+                # A future-dated position stored before it was filtered would block the bus
+                if position['timestamp'] <= latest:
+                    self._fixes[bus_id] = (position['timestamp'], position['latitude'], position['longitude'])
+        return {bus_id: self._fixes.get(bus_id) for bus_id in bus_ids}
+
+    def store(self, fixes):
+        for bus_id, fix in fixes.items():
+            self._fixes[bus_id] = fix
+            self._fixes.move_to_end(bus_id)
+        while len(self._fixes) > self.max_size:
+            self._fixes.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self._fixes.clear()
+
+
+_last_fixes = None
+
+
+def get_last_fixes():
+    global _last_fixes
+    if _last_fixes is None:
+        _last_fixes = LastFixCache(getattr(settings, 'GPS_FILTER_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+    return _last_fixes
+
+
+def filter_fixes(fixes, collapse_jitter=True):
+    """
+    Drop junk fixes before they are stored. ``fixes`` is a list of
+    ``(key, GPSLog)`` pairs; each bus's fixes are checked in time order
+    against the last accepted one:
+
+    * a timestamp more than ``GPS_FILTER_MAX_FUTURE_SECONDS`` ahead of the
+      server clock is rejected, so it can't block the bus's later fixes;
+    * a timestamp not after the previous fix is rejected as a duplicate;
+    * a jump implying more than ``GPS_FILTER_MAX_SPEED_KMH`` is rejected;
+    * with ``collapse_jitter``, a fix within ``GPS_FILTER_JITTER_M`` of the
+      previous one and less than ``GPS_FILTER_KEEPALIVE_SECONDS`` after it is
+      dropped as stationary jitter;
+    * if ``GPS_FILTER_SMOOTHING`` is set, accepted positions are smoothed
+      towards the previous one with that factor (0-1, lower is smoother).
+
+    Returns ``(accepted_logs, rejected, collapsed)`` where ``rejected`` lists
+    ``{"index": key, "error": ...}`` and ``collapsed`` counts dropped jitter.
+    """
+    max_speed = getattr(settings, 'GPS_FILTER_MAX_SPEED_KMH', DEFAULT_MAX_SPEED_KMH) / 3.6
+    jitter_m = getattr(settings, 'GPS_FILTER_JITTER_M', DEFAULT_JITTER_M)
+    keepalive = getattr(settings, 'GPS_FILTER_KEEPALIVE_SECONDS', DEFAULT_KEEPALIVE_SECONDS)
+    smoothing = getattr(settings, 'GPS_FILTER_SMOOTHING', None)
+    latest = timezone.now() + timedelta(
+        seconds=getattr(settings, 'GPS_FILTER_MAX_FUTURE_SECONDS', DEFAULT_MAX_FUTURE_SECONDS)
+    )
+
+    fixes = sorted(fixes, key=lambda fix: (fix[1].bus_id, fix[1].timestamp))
+    accepted, rejected, collapsed = [], [], 0
+
+    cache = get_last_fixes()
+    with cache.lock:
+        last = cache.load({log.bus_id for _, log in fixes}, latest)
+        for key, log in fixes:
+            if log.timestamp > latest:
+                rejected.append({"index": key, "error": "Timestamp is in the future"})
+                continue
+            previous = last[log.bus_id]
+            if previous is not None:
+                seconds = (log.timestamp - previous[0]).total_seconds()
+                if seconds <= 0:
+                    rejected.append({"index": key, "error": "Duplicate or out-of-order timestamp"})
+                    continue
+                distance = haversine_m(previous[1], previous[2], log.latitude, log.longitude)
+                if max_speed and distance / seconds > max_speed:
+                    rejected.append({"index": key, "error": f"Implied speed of {distance / seconds * 3.6:.0f} km/h"})
+                    continue
+                if collapse_jitter and distance < jitter_m and seconds < keepalive:
+                    collapsed += 1
+                    continue
+                if smoothing:
+                    log.latitude = previous[1] + smoothing * (log.latitude - previous[1])
+                    log.longitude = previous[2] + smoothing * (log.longitude - previous[2])
+
+            last[log.bus_id] = (log.timestamp, log.latitude, log.longitude)
+            accepted.append(log)
+
+        cache.store({bus_id: fix for bus_id, fix in last.items() if fix is not None})
+
+    return accepted, rejected, collapsed
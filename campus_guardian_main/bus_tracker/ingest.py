@@ -0,0 +1,125 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .arrivals import detect_arrivals
+from .geofence import apply_geofence
+from .gps_filter import filter_fixes
+from .live import record_positions
+from .models import Bus, GPSLog
+
+DEFAULT_MAX_BATCH = 5000
+INGEST_BATCH_SIZE = 1000
+
+LOG_TYPES = {value for value, _ in GPSLog.LOG_TYPES}
+
+
+class IngestError(ValueError):
+    """Raised when a whole ingestion payload is unusable."""
+
+
+def _parse_timestamp(value, received_at):
+    if value in (None, ''):
+        return received_at
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError):
+            raise ValueError("Invalid timestamp")  # beyond the range of a datetime
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise ValueError("Invalid timestamp")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _parse_fix(fix, received_at):
+    if not isinstance(fix, dict):
+        raise ValueError("Fix must be an object")
+
+    try:
+        bus_id = int(fix['bus_id'])
+        latitude = float(fix['latitude'])
+        longitude = float(fix['longitude'])
+    except KeyError as e:
+        raise ValueError(f"Missing {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("bus_id, latitude and longitude must be numbers")
+
+    if not -90 <= latitude <= 90:
+        raise ValueError("Latitude must be between -90 and 90")
+    if not -180 <= longitude <= 180:
+        raise ValueError("Longitude must be between -180 and 180")
+
+    log_type = fix.get('log_type') or GPSLog.ENTRY
+    if log_type not in LOG_TYPES:
+        raise ValueError("Invalid log_type")
+
+    return GPSLog(
+        bus_id=bus_id,
+        latitude=latitude,
+        longitude=longitude,
+        timestamp=_parse_timestamp(fix.get('timestamp'), received_at),
+        log_type=log_type,
+    )
+
+
+def parse_fixes(payload):
+    """
+    Validate a batch of raw fixes. Returns ``(fixes, rejected, bus_statuses)``
+    where ``fixes`` lists ``(index, GPSLog)`` pairs, ``rejected`` lists
+    ``{"index", "error"}`` for every fix that was dropped and
+    ``bus_statuses`` maps each referenced bus to its location_status.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('fixes')
+    if not isinstance(payload, list):
+        raise IngestError("Expected a list of fixes")
+
+    max_batch = getattr(settings, 'GPS_INGEST_MAX_BATCH', DEFAULT_MAX_BATCH)
+    if len(payload) > max_batch:
+        raise IngestError(f"At most {max_batch} fixes per request")
+
+    received_at = timezone.now()
+    logs, rejected = [], []
+    for index, fix in enumerate(payload):
+        try:
+            logs.append((index, _parse_fix(fix, received_at)))
+        except ValueError as e:
+            rejected.append({"index": index, "error": str(e)})
+
+    # Resolve every referenced bus with a single query
+    bus_statuses = dict(
+        Bus.objects.filter(pk__in={log.bus_id for _, log in logs}).values_list('pk', 'location_status')
+    )
+    accepted = []
+    for index, log in logs:
+        if log.bus_id in bus_statuses:
+            accepted.append((index, log))
+        else:
+            rejected.append({"index": index, "error": "Unknown bus_id"})
+
+    rejected.sort(key=lambda item: item['index'])
+    return accepted, rejected, bus_statuses
+
+
+def ingest_fixes(payload):
+    """
+    Validate, filter and store a batch of fixes. Returns ``(stored_logs,
+    rejected, collapsed)``, ``collapsed`` being the number of stationary
+    jitter fixes dropped by the filter.
+    """
+    fixes, rejected, bus_statuses = parse_fixes(payload)
+    logs, filtered, collapsed = filter_fixes(fixes)
+    if filtered:
+        rejected = sorted(rejected + filtered, key=lambda item: item['index'])
+    if logs:
+        apply_geofence(logs, bus_statuses)
+        GPSLog.objects.bulk_create(logs, batch_size=INGEST_BATCH_SIZE)
+        # bulk_create sends no post_save, so feed the live store directly
+        record_positions(logs)
+        detect_arrivals(logs)
+    return logs, rejected, collapsed
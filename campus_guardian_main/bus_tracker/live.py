@@ -0,0 +1,219 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .geo import GridIndex
+from .models import Bus, GPSLog
+
+DEFAULT_BACKEND = 'campus_guardian_main.bus_tracker.live.CacheLiveBackend'
+DEFAULT_SINCE_OVERLAP_SECONDS = 2
+DEFAULT_GRID_CELL_M = 500
+DEFAULT_GRID_REFRESH_SECONDS = 30
+
+
+class LocalLiveBackend:
+    """
+    Latest position per bus kept in this process's memory. Only for a single
+    worker: other processes' fixes are never seen once it is warm.
+    """
+
+    def __init__(self):
+        self._positions = {}
+        self._warm = False
+        self._lock = threading.Lock()
+
+    def is_warm(self):
+        return self._warm
+
+    def mark_warm(self):
+        self._warm = True
+
+    def get_all(self):
+        with self._lock:
+            return list(self._positions.values())
+
+    def get_many(self, bus_ids):
+        with self._lock:
+            return {bus_id: self._positions[bus_id] for bus_id in bus_ids if bus_id in self._positions}
+
+    def merge(self, positions):
+        with self._lock:
+            for position in positions:
+                current = self._positions.get(position['bus_id'])
+                if current is None or position['timestamp'] >= current['timestamp']:
+                    self._positions[position['bus_id']] = position
+
+    def clear(self):
+        with self._lock:
+            self._positions.clear()
+            self._warm = False
+
+
+class CacheLiveBackend:
+    """
+    Latest position per bus kept in a Django cache shared by all workers.
+
+    Set ``BUS_LIVE_CACHE`` to the alias of a shared cache (Redis, memcached);
+    each bus is one key, plus one key listing the bus ids.
+    """
+    key_prefix = 'bus_live'
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'BUS_LIVE_CACHE', 'default')]
+        self.ids_key = f'{self.key_prefix}:ids'
+
+    def _key(self, bus_id):
+        return f'{self.key_prefix}:{bus_id}'
+
+    def is_warm(self):
+        return self.cache.get(self.ids_key) is not None
+
+    def mark_warm(self):
+        self.cache.add(self.ids_key, [], timeout=None)
+
+    def get_all(self):
+        bus_ids = self.cache.get(self.ids_key) or []
+        return list(self.cache.get_many([self._key(bus_id) for bus_id in bus_ids]).values())
+
+    def get_many(self, bus_ids):
+        return {
+            position['bus_id']: position
+            for position in self.cache.get_many([self._key(bus_id) for bus_id in bus_ids]).values()
+        }
+
+    def merge(self, positions):
+        latest = {}
+        for position in positions:
+            current = latest.get(position['bus_id'])
+            if current is None or position['timestamp'] >= current['timestamp']:
+                latest[position['bus_id']] = position
+
+        stored = self.cache.get_many([self._key(bus_id) for bus_id in latest])
+        updates = {}
+        for bus_id, position in latest.items():
+            current = stored.get(self._key(bus_id))
+            if current is None or position['timestamp'] >= current['timestamp']:
+                updates[self._key(bus_id)] = position
+        self.cache.set_many(updates, timeout=None)
+
+        bus_ids = self.cache.get(self.ids_key) or []
+        new_ids = set(latest) - set(bus_ids)
+        if new_ids:
+            self.cache.set(self.ids_key, sorted(set(bus_ids) | new_ids), timeout=None)
+
+    def clear(self):
+        bus_ids = self.cache.get(self.ids_key) or []
+        self.cache.delete_many([self._key(bus_id) for bus_id in bus_ids] + [self.ids_key])
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(getattr(settings, 'BUS_LIVE_BACKEND', DEFAULT_BACKEND))()
+    return _backend
+
+
+def _position(log, updated_at):
+    return {
+        'bus_id': log.bus_id,
+        'latitude': log.latitude,
+        'longitude': log.longitude,
+        'timestamp': log.timestamp,
+        'log_type': log.log_type,
+        'updated_at': updated_at,
+    }
+
+
+def latest_logs():
+    """The newest GPSLog of every bus, in one query."""
+    newest = GPSLog.objects.filter(bus=OuterRef('pk')).order_by('-timestamp', '-pk').values('pk')[:1]
+    return GPSLog.objects.filter(
+        pk__in=Bus.objects.annotate(latest_log_id=Subquery(newest)).values('latest_log_id')
+    )
+
+
+def warm_up(backend=None):
+    backend = backend or get_backend()
+    now = timezone.now()
+    backend.merge([_position(log, now) for log in latest_logs()])
+    backend.mark_warm()
+
+
+def record_positions(logs):
+    """Fold freshly written GPSLogs into the live store and the nearby-bus grid."""
+    if not logs:
+        return
+    now = timezone.now()
+    positions = [_position(log, now) for log in logs]
+    get_backend().merge(positions)
+    if _grid is not None:
+        _update_grid(_grid, positions)
+
+
+def live_positions(since=None):
+    """
+    Latest position of every bus, optionally only those updated after ``since``.
+    Only a cold store reads GPSLog; afterwards this never touches the database.
+
+    A writer stamps ``updated_at`` just before its merge lands, so positions
+    updated up to ``BUS_LIVE_SINCE_OVERLAP_SECONDS`` before ``since`` are sent
+    again rather than lost between a client's polls. Take ``since`` for the
+    next poll after this returns.
+    """
+    backend = get_backend()
+    if not backend.is_warm():
+        warm_up(backend)
+
+    positions = backend.get_all()
+    if since is not None:
+        since -= timedelta(seconds=getattr(settings, 'BUS_LIVE_SINCE_OVERLAP_SECONDS', DEFAULT_SINCE_OVERLAP_SECONDS))
+        positions = [position for position in positions if position['updated_at'] > since]
+    return sorted(positions, key=lambda position: position['bus_id'])
+
+
+_grid = None
+_grid_built_at = 0.0
+_grid_lock = threading.Lock()
+
+
+def _update_grid(grid, positions):
+    with _grid_lock:
+        for position in positions:
+            current = grid.points.get(position['bus_id'])
+            if current is None or position['timestamp'] >= current[3]['timestamp']:
+                grid.update(position['bus_id'], position['latitude'], position['longitude'], position)
+
+
+def get_grid():
+    """
+    Grid index over the latest position of every bus. Fixes written by this
+    process update it directly; it is rebuilt from the live store every
+    ``BUS_GRID_REFRESH_SECONDS`` to pick up fixes stored by other workers.
+    """
+    global _grid, _grid_built_at
+    refresh = getattr(settings, 'BUS_GRID_REFRESH_SECONDS', DEFAULT_GRID_REFRESH_SECONDS)
+    if _grid is None or time.monotonic() - _grid_built_at > refresh:
+        grid = GridIndex(getattr(settings, 'BUS_GRID_CELL_M', DEFAULT_GRID_CELL_M))
+        _update_grid(grid, live_positions())
+        _grid, _grid_built_at = grid, time.monotonic()
+    return _grid
+
+
+def nearby_positions(lat, lng, radius_m, limit):
+    """Up to ``limit`` ``(distance_m, position)`` pairs within ``radius_m`` of a point, nearest first."""
+    grid = get_grid()
+    with _grid_lock:
+        matches = grid.within(lat, lng, radius_m)
+    return [(distance, position) for distance, _, position in matches[:limit]]
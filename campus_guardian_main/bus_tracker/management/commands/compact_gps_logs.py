@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from campus_guardian_main.bus_tracker.retention import compact_gps_logs, retention_policy
+
+
+class Command(BaseCommand):
+    help = "Downsample GPS logs older than the retention window into track points and delete the raw rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-days', type=int, help="Override GPS_RAW_RETENTION_DAYS for this run")
+        parser.add_argument('--batch-size', type=int, help="Override GPS_COMPACTION_BATCH_SIZE for this run")
+
+    def handle(self, *args, **options):
+        policy = retention_policy()
+        if options['raw_days'] is not None:
+            policy['raw_days'] = options['raw_days']
+        if options['batch_size']:
+            policy['batch_size'] = options['batch_size']
+
+        report = compact_gps_logs(policy=policy)
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {report['rows_compacted']} GPS logs into {report['points_written']} track points, "
+            f"~{report['bytes_reclaimed']} bytes reclaimed"
+        ))
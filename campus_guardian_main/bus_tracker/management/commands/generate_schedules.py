@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from campus_guardian_main.bus_tracker.models import ScheduleTemplate
+from campus_guardian_main.bus_tracker.timetable import generate_schedules
+
+
+class Command(BaseCommand):
+    help = "Expand active schedule templates into schedules and stop times over a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', required=True, help="First service day (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='end', required=True, help="Last service day (YYYY-MM-DD)")
+        parser.add_argument('--template', type=int, action='append', dest='templates',
+                            help="Only expand this template id (repeatable)")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start'])
+            end = date.fromisoformat(options['end'])
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format")
+        if start > end:
+            raise CommandError("--from must be on or before --to")
+
+        templates = ScheduleTemplate.objects.filter(is_active=True)
+        if options['templates']:
+            templates = templates.filter(pk__in=options['templates'])
+
+        schedules_created, stop_times_created, conflicts = generate_schedules(start, end, templates)
+        for conflict in conflicts:
+            self.stderr.write(
+                f"Skipped template {conflict['template_id']} on {conflict['service_date']}: bus is double-booked"
+                + (f" with schedule {conflict['conflicts_with']}" if conflict['conflicts_with']
+                   else f" with template {conflict['conflicts_with_template_id']}")
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {schedules_created} schedules and {stop_times_created} stop times for {start} to {end}"
+        ))
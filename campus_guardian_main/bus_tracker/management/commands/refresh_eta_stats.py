@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from campus_guardian_main.bus_tracker.eta import refresh_delay_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute per route, stop and hour delay statistics used for predicted arrivals."
+
+    def handle(self, *args, **options):
+        written = refresh_delay_stats()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} stop delay statistics"))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gpslog',
+            index=models.Index(fields=['timestamp'], name='bus_tracker_timesta_e3a751_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0002_gpslog_bus_tracker_timesta_e3a751_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['bus', 'departure_time'], name='bus_tracker_bus_id_13e265_idx'),
+        ),
+    ]
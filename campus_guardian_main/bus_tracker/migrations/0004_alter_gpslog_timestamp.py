@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0003_schedule_bus_tracker_bus_id_13e265_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gpslog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
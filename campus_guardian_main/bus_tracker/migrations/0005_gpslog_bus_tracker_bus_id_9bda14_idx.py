@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0004_alter_gpslog_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gpslog',
+            index=models.Index(fields=['bus', 'timestamp'], name='bus_tracker_bus_id_9bda14_idx'),
+        ),
+    ]
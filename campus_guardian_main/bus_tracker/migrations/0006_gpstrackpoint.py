@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0005_gpslog_bus_tracker_bus_id_9bda14_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GPSTrackPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('log_type', models.CharField(choices=[('entry', 'Entry'), ('exit', 'Exit')], default='entry', max_length=5)),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_points', to='bus_tracker.bus')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bus', 'timestamp'], name='bus_tracker_bus_id_07df26_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0006_gpstrackpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='stop_coordinates',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
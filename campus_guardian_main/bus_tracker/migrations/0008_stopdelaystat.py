@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0007_route_stop_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StopDelayStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stop_name', models.CharField(max_length=100)),
+                ('hour', models.PositiveSmallIntegerField(help_text='Local hour of the scheduled arrival (0-23)')),
+                ('samples', models.PositiveIntegerField()),
+                ('mean_delay_seconds', models.IntegerField()),
+                ('computed_at', models.DateTimeField()),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delay_stats', to='bus_tracker.route')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='stopdelaystat',
+            constraint=models.UniqueConstraint(fields=('route', 'stop_name', 'hour'), name='unique_stop_delay_stat'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:14
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0008_stopdelaystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days_of_week', models.CharField(default='0,1,2,3,4', help_text='Comma separated weekdays the trip runs on, Monday is 0', max_length=13, validators=[django.core.validators.RegexValidator(re.compile('^\\d+(?:,\\d+)*\\Z'), code='invalid', message='Enter only digits separated by commas.')])),
+                ('departure_time', models.TimeField()),
+                ('duration_minutes', models.PositiveIntegerField()),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TemplateStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stop_name', models.CharField(max_length=100)),
+                ('offset_minutes', models.PositiveIntegerField(help_text='Minutes after departure')),
+            ],
+            options={
+                'ordering': ['offset_minutes', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='service_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='templatestop',
+            name='template',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='bus_tracker.scheduletemplate'),
+        ),
+        migrations.AddField(
+            model_name='scheduletemplate',
+            name='bus',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_templates', to='bus_tracker.bus'),
+        ),
+        migrations.AddField(
+            model_name='scheduletemplate',
+            name='route',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='templates', to='bus_tracker.route'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='bus_tracker.scheduletemplate'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=models.UniqueConstraint(fields=('template', 'service_date'), name='unique_template_trip_per_day'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:15
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_stops(text):
+    return [name.strip() for name in re.split(r'[,;\n]+', text or '') if name.strip()]
+
+
+def backfill_route_stops(apps, schema_editor):
+    Route = apps.get_model('bus_tracker', 'Route')
+    RouteStop = apps.get_model('bus_tracker', 'RouteStop')
+
+    route_stops = []
+    for route in Route.objects.all().iterator():
+        coordinates = route.stop_coordinates or {}
+        for sequence, name in enumerate(split_stops(route.stops), start=1):
+            latitude, longitude = coordinates.get(name) or (None, None)
+            route_stops.append(RouteStop(
+                route_id=route.pk, name=name[:100], sequence=sequence, latitude=latitude, longitude=longitude,
+            ))
+    RouteStop.objects.bulk_create(route_stops, batch_size=1000)
+
+
+def restore_stop_coordinates(apps, schema_editor):
+    Route = apps.get_model('bus_tracker', 'Route')
+    RouteStop = apps.get_model('bus_tracker', 'RouteStop')
+
+    coordinates = {}
+    for route_id, name, latitude, longitude in RouteStop.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).values_list('route_id', 'name', 'latitude', 'longitude'):
+        coordinates.setdefault(route_id, {})[name] = [latitude, longitude]
+    for route_id, stop_coordinates in coordinates.items():
+        Route.objects.filter(pk=route_id).update(stop_coordinates=stop_coordinates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0009_scheduletemplate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('sequence', models.PositiveIntegerField()),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='route_stops', to='bus_tracker.route')),
+            ],
+            options={
+                'ordering': ['route', 'sequence'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='routestop',
+            constraint=models.UniqueConstraint(fields=('route', 'sequence'), name='unique_route_stop_sequence'),
+        ),
+        migrations.RunPython(backfill_route_stops, restore_stop_coordinates),
+        migrations.RemoveField(
+            model_name='route',
+            name='stop_coordinates',
+        ),
+        migrations.AddIndex(
+            model_name='stoptime',
+            index=models.Index(fields=['stop_name', 'arrival_time'], name='bus_tracker_stop_na_049da4_idx'),
+        ),
+    ]
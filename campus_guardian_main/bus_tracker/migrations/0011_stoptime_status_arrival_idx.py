@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0010_routestop'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stoptime',
+            index=models.Index(fields=['stop_status', 'arrival_time'], name='bus_tracker_stop_st_1b77c1_idx'),
+        ),
+    ]
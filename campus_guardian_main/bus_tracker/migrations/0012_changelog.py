@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bus_tracker', '0011_stoptime_status_arrival_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('bus', 'Bus'), ('route', 'Route'), ('schedule', 'Schedule')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
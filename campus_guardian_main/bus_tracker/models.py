@@ -1,4 +1,26 @@
+from django.core.validators import validate_comma_separated_integer_list
 from django.db import models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+class BusQuerySet(models.QuerySet):
+    def with_trip_ids(self, now=None):
+        """
+        Annotate each bus with the ids of its last trip, next trip and driver,
+        so a whole page of buses is resolved by the main query.
+        """
+        now = now or timezone.now()
+        schedules = Schedule.objects.filter(bus=OuterRef('pk'))
+        last_trip = schedules.filter(departure_time__lt=now).order_by('-departure_time', '-pk')
+        next_trip = schedules.filter(departure_time__gte=now).order_by('departure_time', 'pk')
+        driver = Driver.objects.filter(assigned_bus=OuterRef('pk')).order_by('pk')
+        return self.annotate(
+            last_trip_id=Subquery(last_trip.values('pk')[:1]),
+            next_trip_id=Subquery(next_trip.values('pk')[:1]),
+            current_driver_id=Subquery(driver.values('pk')[:1]),
+        )
+
 
 class Bus(models.Model):
     LOCATION_STATUS_CHOICES = [
@@ -18,6 +40,8 @@ class Bus(models.Model):
     location_status = models.CharField(max_length=20, choices=LOCATION_STATUS_CHOICES, default="in_campus")
     schedule_status = models.CharField(max_length=20, choices=SCHEDULE_STATUS_CHOICES, default="scheduled")
 
+    objects = BusQuerySet.as_manager()
+
     def __str__(self):
         return self.plate_number
 
@@ -25,11 +49,29 @@ class Route(models.Model):
     name = models.CharField(max_length=100)
     start_point = models.CharField(max_length=100)
     end_point = models.CharField(max_length=100)
-    stops = models.TextField()
+    stops = models.TextField()  # Comma separated stop names, kept in sync with route_stops
 
     def __str__(self):
         return self.name
 
+
+class RouteStop(models.Model):
+    """One stop of a route, in travel order. Coordinates are used to detect arrivals from GPS."""
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='route_stops')
+    name = models.CharField(max_length=100, db_index=True)
+    sequence = models.PositiveIntegerField()
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['route', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['route', 'sequence'], name='unique_route_stop_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.sequence}. {self.name} ({self.route})"
+
 class Driver(models.Model):
     name = models.CharField(max_length=100)
     license_no = models.CharField(max_length=50)
@@ -43,6 +85,19 @@ class Schedule(models.Model):
     bus = models.ForeignKey(Bus, on_delete=models.CASCADE)
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    # Set on trips generated from a ScheduleTemplate, see timetable.py
+    template = models.ForeignKey(
+        'ScheduleTemplate', on_delete=models.SET_NULL, null=True, blank=True, related_name='schedules'
+    )
+    service_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bus', 'departure_time']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'service_date'], name='unique_template_trip_per_day'),
+        ]
 
     def __str__(self):
         return f"{self.bus} on {self.route} ({self.departure_time} - {self.arrival_time})"
@@ -83,6 +138,8 @@ class StopTime(models.Model):
         ordering = ['arrival_time']
         indexes = [
             models.Index(fields=['arrival_time']),
+            models.Index(fields=['stop_name', 'arrival_time']),
+            models.Index(fields=['stop_status', 'arrival_time']),
         ]
 
     def __str__(self):
@@ -96,7 +153,10 @@ class StopTime(models.Model):
         return None
 
     def update_status(self):
-        """Auto-update stop_status based on time and actual arrival."""
+        """
+        Auto-update stop_status based on time and actual arrival. For many
+        stops use sweeper.sweep_stop_statuses, which does this set-based.
+        """
         now = timezone.now()
         if self.actual_arrival_time:
             self.stop_status = "arrived"
@@ -119,8 +179,127 @@ class GPSLog(models.Model):
     bus = models.ForeignKey(Bus, on_delete=models.CASCADE)
     latitude = models.FloatField(null=False, blank=False)
     longitude = models.FloatField(null=False, blank=False)
-    timestamp = models.DateTimeField(auto_now_add=True, null=False, blank=False)
+    timestamp = models.DateTimeField(default=timezone.now, null=False, blank=False)
     log_type = models.CharField(max_length=5, choices=LOG_TYPES, default=ENTRY)  # Entry or Exit log
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['bus', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"GPS Log for Bus {self.bus.id} - {self.get_log_type_display()} at {self.timestamp}"
+
+
+class GPSTrackPoint(models.Model):
+    """
+    Downsampled GPS history. Raw GPSLog rows older than the retention window
+    are thinned into these points and then deleted, see retention.py.
+    """
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name='track_points')
+    timestamp = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    log_type = models.CharField(max_length=5, choices=GPSLog.LOG_TYPES, default=GPSLog.ENTRY)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bus', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"Track point for Bus {self.bus_id} at {self.timestamp}"
+
+
+class StopDayVersion(models.Model):
+    """
+    Counter bumped whenever a stop scheduled on ``day`` changes. Cached
+    on-time reports are keyed by the versions of their days, see analytics.py.
+    """
+    day = models.DateField(unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} v{self.version}"
+
+
+class StopDelayStat(models.Model):
+    """
+    Average delay at a stop of a route for one hour of the day, computed
+    nightly from StopTime history and used to predict arrivals, see eta.py.
+    """
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='delay_stats')
+    stop_name = models.CharField(max_length=100)
+    hour = models.PositiveSmallIntegerField(help_text="Local hour of the scheduled arrival (0-23)")
+    samples = models.PositiveIntegerField()
+    mean_delay_seconds = models.IntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['route', 'stop_name', 'hour'], name='unique_stop_delay_stat'),
+        ]
+
+    def __str__(self):
+        return f"{self.stop_name} on {self.route} at {self.hour:02d}:00 ({self.mean_delay_seconds}s)"
+
+
+class ScheduleTemplate(models.Model):
+    """
+    A trip that repeats on given weekdays. Templates are expanded into
+    Schedule and StopTime rows over a date range by timetable.generate_schedules.
+    """
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='templates')
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name='schedule_templates')
+    days_of_week = models.CharField(
+        max_length=13,
+        default='0,1,2,3,4',
+        validators=[validate_comma_separated_integer_list],
+        help_text="Comma separated weekdays the trip runs on, Monday is 0",
+    )
+    departure_time = models.TimeField()
+    duration_minutes = models.PositiveIntegerField()
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.bus} on {self.route} at {self.departure_time:%H:%M} ({self.days_of_week})"
+
+    def weekdays(self):
+        return {int(day) for day in self.days_of_week.split(',') if day != ''}
+
+
+class TemplateStop(models.Model):
+    template = models.ForeignKey(ScheduleTemplate, on_delete=models.CASCADE, related_name='stops')
+    stop_name = models.CharField(max_length=100)
+    offset_minutes = models.PositiveIntegerField(help_text="Minutes after departure")
+
+    class Meta:
+        ordering = ['offset_minutes', 'id']
+
+    def __str__(self):
+        return f"{self.stop_name} (+{self.offset_minutes} min)"
+
+
+class ChangeLog(models.Model):
+    """
+    One row per change to a synced object. The id is the change token handed
+    to clients, see sync.py. Stop time changes are logged against their
+    schedule and route stop changes against their route.
+    """
+    BUS = 'bus'
+    ROUTE = 'route'
+    SCHEDULE = 'schedule'
+
+    KINDS = [
+        (BUS, 'Bus'),
+        (ROUTE, 'Route'),
+        (SCHEDULE, 'Schedule'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
     def __str__(self):
-        return f"GPS Log for Bus {self.bus.id} - {self.get_log_type_display()} at {self.timestamp}"
\ No newline at end of file
+        return f"{self.kind} {self.object_id} changed at {self.changed_at}"
@@ -0,0 +1,118 @@
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .geo import haversine_m
+from .models import Bus, GPSLog, GPSTrackPoint
+
+# Rough on-disk size of one row including its indexes, used to estimate
+# how much space a compaction run frees.
+GPSLOG_ROW_BYTES = 120
+TRACK_POINT_ROW_BYTES = 90
+
+
+def retention_policy():
+    return {
+        'raw_days': getattr(settings, 'GPS_RAW_RETENTION_DAYS', 7),
+        'downsample_seconds': getattr(settings, 'GPS_DOWNSAMPLE_SECONDS', 60),
+        'min_distance_m': getattr(settings, 'GPS_DOWNSAMPLE_MIN_DISTANCE_M', 50),
+        'batch_size': getattr(settings, 'GPS_COMPACTION_BATCH_SIZE', 5000),
+    }
+
+
+def _keep(previous, row, downsample_seconds, min_distance_m):
+    """Whether ``row`` should survive downsampling after the last kept point."""
+    if previous is None:
+        return True
+    timestamp, latitude, longitude, log_type = row
+    if timestamp <= previous[0]:
+        return False
+    if log_type != previous[3]:
+        return True
+    if downsample_seconds and (timestamp - previous[0]).total_seconds() >= downsample_seconds:
+        return True
+    if min_distance_m and haversine_m(previous[1], previous[2], latitude, longitude) >= min_distance_m:
+        return True
+    return False
+
+
+def compact_gps_logs(now=None, policy=None):
+    """
+    Move raw GPSLog rows older than the retention window into GPSTrackPoint.
+
+    Rows are handled oldest first in batches of ``batch_size``. Each batch is
+    downsampled per bus, written, and its raw rows deleted in its own short
+    transaction, so the job can stop and resume at any point. Returns a dict
+    with the number of rows read, points kept and the estimated bytes freed.
+    """
+    policy = policy or retention_policy()
+    cutoff = (now or timezone.now()) - timedelta(days=policy['raw_days'])
+
+    # Last kept point per bus, so downsampling continues across runs
+    newest = GPSTrackPoint.objects.filter(bus=OuterRef('pk')).order_by('-timestamp', '-pk').values('pk')[:1]
+    last_kept = {
+        bus_id: tuple(row)
+        for bus_id, *row in GPSTrackPoint.objects.filter(
+            pk__in=Bus.objects.annotate(newest_point_id=Subquery(newest)).values('newest_point_id')
+        ).values_list('bus_id', 'timestamp', 'latitude', 'longitude', 'log_type')
+    }
+
+    rows_compacted = points_written = 0
+    while True:
+        batch = list(
+            GPSLog.objects.filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'pk')
+            .values_list('pk', 'bus_id', 'timestamp', 'latitude', 'longitude', 'log_type')[:policy['batch_size']]
+        )
+        if not batch:
+            break
+
+        points = []
+        for pk, bus_id, *row in batch:
+            row = tuple(row)
+            if _keep(last_kept.get(bus_id), row, policy['downsample_seconds'], policy['min_distance_m']):
+                last_kept[bus_id] = row
+                timestamp, latitude, longitude, log_type = row
+                points.append(GPSTrackPoint(
+                    bus_id=bus_id, timestamp=timestamp, latitude=latitude, longitude=longitude, log_type=log_type
+                ))
+
+        with transaction.atomic():
+            GPSTrackPoint.objects.bulk_create(points)
+            GPSLog.objects.filter(pk__in=[row[0] for row in batch]).delete()
+
+        rows_compacted += len(batch)
+        points_written += len(points)
+
+    return {
+        'cutoff': cutoff,
+        'rows_compacted': rows_compacted,
+        'points_written': points_written,
+        'bytes_reclaimed': rows_compacted * GPSLOG_ROW_BYTES - points_written * TRACK_POINT_ROW_BYTES,
+    }
+
+
+def track_points(bus_id, start, end):
+    """
+    Every known position of a bus between ``start`` and ``end``, oldest first,
+    as ``(timestamp, latitude, longitude, log_type)`` tuples. Reads both the
+    raw GPSLog rows and the compacted GPSTrackPoint history.
+    """
+    fields = ('timestamp', 'latitude', 'longitude', 'log_type')
+    raw = (
+        GPSLog.objects.filter(bus_id=bus_id, timestamp__gte=start, timestamp__lte=end)
+        .order_by('timestamp', 'pk').values_list(*fields)
+    )
+    compacted = (
+        GPSTrackPoint.objects.filter(bus_id=bus_id, timestamp__gte=start, timestamp__lte=end)
+        .order_by('timestamp', 'pk').values_list(*fields)
+    )
+    return heapq.merge(
+        compacted.iterator(chunk_size=2000),
+        raw.iterator(chunk_size=2000),
+        key=lambda point: point[0],
+    )
@@ -1,14 +1,69 @@
-from rest_framework import serializers
-from .models import Bus, Driver, Route, Schedule, GPSLog, StopTime
+from django.db import models, transaction
 from django.utils import timezone
+from rest_framework import serializers
+from .analytics import touch_stop_days
+from .arrivals import reset_indexes
+from .conflicts import Trip, find_conflicts
+from .eta import predict_arrival
+from .geofence import apply_geofence
+from .gps_filter import filter_fixes
+from .stops import set_route_stops, set_route_stops_from_text
+from .models import Bus, Driver, Route, RouteStop, Schedule, ScheduleTemplate, TemplateStop, GPSLog, StopTime
+
+class RouteStopSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RouteStop
+        fields = ['id', 'name', 'sequence', 'latitude', 'longitude']
+        read_only_fields = ['sequence']  # Taken from the position in the list
+
+    def validate(self, data):
+        if (data.get('latitude') is None) != (data.get('longitude') is None):
+            raise serializers.ValidationError("latitude and longitude must be given together")
+        return data
+
 
 class RouteSerializer(serializers.ModelSerializer):
+    # Either field may be written; the other is derived from it
+    stops = serializers.CharField(required=False)
+    route_stops = RouteStopSerializer(many=True, required=False)
+
     class Meta:
         model = Route
-        fields = ['id', 'name', 'start_point', 'end_point', 'stops']
+        fields = ['id', 'name', 'start_point', 'end_point', 'stops', 'route_stops']
+
+    def validate(self, data):
+        if self.instance is None and 'stops' not in data and 'route_stops' not in data:
+            raise serializers.ValidationError("Provide stops or route_stops")
+        return data
+
+    def create(self, validated_data):
+        route_stops = validated_data.pop('route_stops', None)
+        with transaction.atomic():
+            route = Route.objects.create(**validated_data)
+            if route_stops is not None:
+                set_route_stops(route, route_stops)
+            else:
+                set_route_stops_from_text(route, route.stops)
+        return route
+
+    def update(self, instance, validated_data):
+        route_stops = validated_data.pop('route_stops', None)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            if route_stops is not None:
+                set_route_stops(instance, route_stops)
+            elif 'stops' in validated_data:
+                set_route_stops_from_text(instance, instance.stops)
+        return instance
 
 class StopTimeSerializer(serializers.ModelSerializer):
+    # Writable so nested schedule updates can address existing stop times
+    id = serializers.IntegerField(required=False)
     late_by = serializers.SerializerMethodField()
+    predicted_arrival = serializers.SerializerMethodField()
 
     class Meta:
         model = StopTime
@@ -18,9 +73,10 @@ class StopTimeSerializer(serializers.ModelSerializer):
             'arrival_time',
             'actual_arrival_time',
             'stop_status',
-            'late_by'
+            'late_by',
+            'predicted_arrival'
         ]
-        read_only_fields = ['late_by']
+        read_only_fields = ['late_by', 'predicted_arrival']
 
     def get_late_by(self, obj):
         if obj.actual_arrival_time:
@@ -34,9 +90,22 @@ class StopTimeSerializer(serializers.ModelSerializer):
                 return "on time"
         return None
 
+    def get_predicted_arrival(self, obj):
+        # obj.schedule is already cached when stop times are read through their schedule
+        predicted = predict_arrival(obj.schedule.route_id, obj)
+        return serializers.DateTimeField().to_representation(predicted) if predicted else None
+
+
+class RouteSummarySerializer(serializers.ModelSerializer):
+    """Route without its structured stops, for nesting in schedule and bus payloads."""
+
+    class Meta:
+        model = Route
+        fields = ['id', 'name', 'start_point', 'end_point', 'stops']
+
 
 class ScheduleSerializer(serializers.ModelSerializer):
-    route = RouteSerializer(read_only=True)
+    route = RouteSummarySerializer(read_only=True)
     route_id = serializers.PrimaryKeyRelatedField(
         queryset=Route.objects.all(),
         source='route',
@@ -49,35 +118,101 @@ class ScheduleSerializer(serializers.ModelSerializer):
         model = Schedule
         fields = ['id', 'route', 'route_id', 'bus', 'departure_time', 'arrival_time', 'stop_times']
 
+    def validate(self, data):
+        bus = data.get('bus', getattr(self.instance, 'bus', None))
+        departure_time = data.get('departure_time', getattr(self.instance, 'departure_time', None))
+        arrival_time = data.get('arrival_time', getattr(self.instance, 'arrival_time', None))
+        if departure_time and arrival_time and arrival_time <= departure_time:
+            raise serializers.ValidationError("arrival_time must be after departure_time")
+
+        if bus and departure_time and arrival_time:
+            trip = Trip(getattr(self.instance, 'pk', None), bus.pk, departure_time, arrival_time)
+            for _, other in find_conflicts([trip]):
+                raise serializers.ValidationError({
+                    "bus": f"Bus is already booked from {timezone.localtime(other.departure_time):%Y-%m-%d %H:%M} "
+                           f"to {timezone.localtime(other.arrival_time):%Y-%m-%d %H:%M} (schedule {other.pk})"
+                })
+        return data
+
     def create(self, validated_data):
         stop_times_data = validated_data.pop('stop_times')
 
-        # Now validated_data includes route_id (as 'route') because of the source='route'
-        schedule = Schedule.objects.create(**validated_data)
-
-        for stop_time_data in stop_times_data:
-            StopTime.objects.create(schedule=schedule, **stop_time_data)
+        with transaction.atomic():
+            # Now validated_data includes route_id (as 'route') because of the source='route'
+            schedule = Schedule.objects.create(**validated_data)
+            stop_times = StopTime.objects.bulk_create([
+                StopTime(schedule=schedule, **self._stop_time_fields(stop_time_data))
+                for stop_time_data in stop_times_data
+            ])
+            touch_stop_days(stop_time.arrival_time for stop_time in stop_times)
 
         return schedule
 
     def update(self, instance, validated_data):
         stop_times_data = validated_data.pop('stop_times', None)
 
-        # Update base fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            # Update base fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
 
-        if stop_times_data is not None:
-            # Delete old stop times
-            instance.stop_times.all().delete()
-
-            # Create new stop times
-            for stop_time_data in stop_times_data:
-                StopTime.objects.create(schedule=instance, **stop_time_data)
+            if stop_times_data is not None:
+                self._sync_stop_times(instance, stop_times_data)
 
         return instance
 
+    @staticmethod
+    def _stop_time_fields(stop_time_data):
+        return {field: value for field, value in stop_time_data.items() if field != 'id'}
+
+    def _sync_stop_times(self, schedule, stop_times_data):
+        """
+        Apply the submitted stop times to ``schedule`` as a diff.
+
+        Incoming entries are matched to existing rows by id, else by
+        (stop_name, arrival_time). Matched rows are updated only when a field
+        changed, unmatched entries are inserted and rows no longer listed are
+        deleted, so arrival history on unchanged stops is kept.
+        """
+        existing = list(schedule.stop_times.all())
+        by_id = {stop_time.pk: stop_time for stop_time in existing}
+        by_key = {(stop_time.stop_name, stop_time.arrival_time): stop_time for stop_time in existing}
+
+        matched, to_create, to_update, changed_fields = set(), [], [], set()
+        touched_days = []
+        for stop_time_data in stop_times_data:
+            fields = self._stop_time_fields(stop_time_data)
+            stop_time = by_id.get(stop_time_data.get('id')) or by_key.get(
+                (fields.get('stop_name'), fields.get('arrival_time'))
+            )
+            if stop_time is None or stop_time.pk in matched:
+                to_create.append(StopTime(schedule=schedule, **fields))
+                continue
+
+            matched.add(stop_time.pk)
+            changed = {field for field, value in fields.items() if getattr(stop_time, field) != value}
+            if changed:
+                touched_days.append(stop_time.arrival_time)
+                for field in changed:
+                    setattr(stop_time, field, fields[field])
+                to_update.append(stop_time)
+                changed_fields |= changed
+
+        removed = [stop_time.pk for stop_time in existing if stop_time.pk not in matched]
+        touched_days += [stop_time.arrival_time for stop_time in existing if stop_time.pk not in matched]
+        touched_days += [stop_time.arrival_time for stop_time in to_update + to_create]
+        if removed:
+            StopTime.objects.filter(pk__in=removed).delete()
+        if to_update:
+            StopTime.objects.bulk_update(to_update, sorted(changed_fields))
+        if to_create:
+            StopTime.objects.bulk_create(to_create)
+
+        # Bulk writes send no signals, so drop cached stops and reports here
+        transaction.on_commit(lambda: reset_indexes(schedule_ids=[schedule.pk]))
+        touch_stop_days(touched_days)
+
 # class ScheduleSerializer(serializers.ModelSerializer):
 #     route = RouteSerializer(read_only=True)
 #     stop_times = StopTimeSerializer(many=True, read_only=True)
@@ -97,6 +232,46 @@ class ScheduleSerializer(serializers.ModelSerializer):
 #         return schedule
 
 
+class TemplateStopSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TemplateStop
+        fields = ['id', 'stop_name', 'offset_minutes']
+
+
+class ScheduleTemplateSerializer(serializers.ModelSerializer):
+    stops = TemplateStopSerializer(many=True)
+
+    class Meta:
+        model = ScheduleTemplate
+        fields = ['id', 'route', 'bus', 'days_of_week', 'departure_time', 'duration_minutes', 'is_active', 'stops']
+
+    def validate_days_of_week(self, value):
+        days = [day for day in value.split(',') if day != '']
+        if not days or any(not 0 <= int(day) <= 6 for day in days):
+            raise serializers.ValidationError("Weekdays must be numbers from 0 (Monday) to 6 (Sunday)")
+        return ','.join(sorted(set(days), key=int))
+
+    def create(self, validated_data):
+        stops_data = validated_data.pop('stops')
+        with transaction.atomic():
+            template = ScheduleTemplate.objects.create(**validated_data)
+            TemplateStop.objects.bulk_create([TemplateStop(template=template, **stop) for stop in stops_data])
+        return template
+
+    def update(self, instance, validated_data):
+        stops_data = validated_data.pop('stops', None)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            if stops_data is not None:
+                # Template stops carry no history, so replace them wholesale
+                instance.stops.all().delete()
+                TemplateStop.objects.bulk_create([TemplateStop(template=instance, **stop) for stop in stops_data])
+        return instance
+
+
 class ScheduleWithRouteSerializer(serializers.ModelSerializer):
     route = RouteSerializer(read_only=True)  # Full route details
 
@@ -109,6 +284,65 @@ class DriverSerializer(serializers.ModelSerializer):
         model = Driver
         fields = '__all__'
 
+def load_bus_trips(buses):
+    """
+    Attach last trip, next trip and driver to every bus in ``buses``.
+
+    Uses the ids annotated by ``Bus.objects.with_trip_ids()`` when present
+    (one extra query otherwise), then loads the schedules with their routes
+    and stop times and the drivers in a fixed number of queries, however
+    many buses there are.
+    """
+    pending = [bus for bus in buses if not hasattr(bus, '_trips')]
+    if not pending:
+        return
+
+    unannotated = {bus.pk for bus in pending if not hasattr(bus, 'last_trip_id')}
+    if unannotated:
+        trip_ids = {
+            row[0]: row[1:]
+            for row in Bus.objects.filter(pk__in=unannotated).with_trip_ids().values_list(
+                'pk', 'last_trip_id', 'next_trip_id', 'current_driver_id'
+            )
+        }
+        for bus in pending:
+            if bus.pk in unannotated:
+                bus.last_trip_id, bus.next_trip_id, bus.current_driver_id = trip_ids.get(bus.pk, (None, None, None))
+
+    schedule_ids = {bus.last_trip_id for bus in pending} | {bus.next_trip_id for bus in pending}
+    schedule_ids.discard(None)
+    driver_ids = {bus.current_driver_id for bus in pending} - {None}
+
+    schedules = {}
+    if schedule_ids:
+        schedules = (
+            Schedule.objects.select_related('route').prefetch_related('stop_times').in_bulk(schedule_ids)
+        )
+    drivers = Driver.objects.in_bulk(driver_ids) if driver_ids else {}
+
+    for bus in pending:
+        bus._trips = {
+            'last_trip': schedules.get(bus.last_trip_id),
+            'next_trip': schedules.get(bus.next_trip_id),
+            'driver': drivers.get(bus.current_driver_id),
+        }
+
+
+class BusListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        buses = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        load_bus_trips(buses)
+        return super().to_representation(buses)
+
+
+class BusSummarySerializer(serializers.ModelSerializer):
+    """Bus without its derived trips and driver, for the sync feed."""
+
+    class Meta:
+        model = Bus
+        fields = '__all__'
+
+
 class BusSerializer(serializers.ModelSerializer):
     last_trip = serializers.SerializerMethodField()
     next_trip = serializers.SerializerMethodField()
@@ -119,26 +353,38 @@ class BusSerializer(serializers.ModelSerializer):
         fields = '__all__'
         extra_fields = ('last_trip', 'next_trip', 'driver')
         read_only_fields = extra_fields
+        list_serializer_class = BusListSerializer
+
+    def to_representation(self, instance):
+        load_bus_trips([instance])
+        return super().to_representation(instance)
 
     def get_last_trip(self, obj):
-        last_schedule = Schedule.objects.filter(bus=obj, departure_time__lt=timezone.now()).order_by('-departure_time').first()
+        last_schedule = obj._trips['last_trip']
         if last_schedule:
             return ScheduleSerializer(last_schedule).data
         return None
 
     def get_driver(self, obj):
-        driver = Driver.objects.filter(assigned_bus=obj).first()
+        driver = obj._trips['driver']
         if driver:
             return DriverSerializer(driver).data
         return None
 
     def get_next_trip(self, obj):
-        next_schedule = Schedule.objects.filter(bus=obj, departure_time__gte=timezone.now()).order_by('departure_time').first()
+        next_schedule = obj._trips['next_trip']
         if next_schedule:
             return ScheduleSerializer(next_schedule).data
         return None
 
 
+class GPSLogListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        logs = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        load_bus_trips([log.bus for log in logs])
+        return super().to_representation(logs)
+
+
 class GPSLogSerializer(serializers.ModelSerializer):
     # For output representation
     bus = BusSerializer(read_only=True)
@@ -174,6 +420,7 @@ class GPSLogSerializer(serializers.ModelSerializer):
             'log_type'
         ]
         read_only_fields = ['timestamp']  # Auto-set by model
+        list_serializer_class = GPSLogListSerializer
 
     def validate(self, data):
         """
@@ -191,5 +438,12 @@ class GPSLogSerializer(serializers.ModelSerializer):
         """
         Create GPS log entry
         """
-        # timestamp is auto-set by model
-        return GPSLog.objects.create(**validated_data)
\ No newline at end of file
+        # timestamp is auto-set by model; log_type comes from the geofence when one is configured
+        log = GPSLog(**validated_data)
+        # A single fix is never collapsed, but duplicates and impossible jumps are refused
+        _, rejected, _ = filter_fixes([(0, log)], collapse_jitter=False)
+        if rejected:
+            raise serializers.ValidationError(rejected[0]['error'])
+        apply_geofence([log])
+        log.save()
+        return log
\ No newline at end of file
@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .analytics import touch_stop_days
+from .arrivals import detect_arrivals, reset_indexes
+from .live import record_positions
+from .models import Bus, ChangeLog, GPSLog, Route, RouteStop, Schedule, StopTime
+from .sync import record_changes
+
+
+@receiver(post_save, sender=GPSLog)
+def update_live_position(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_positions([instance])
+        detect_arrivals([instance])
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def reset_schedule_stop_index(sender, instance, **kwargs):
+    reset_indexes(bus_ids=[instance.bus_id], schedule_ids=[instance.pk])
+
+
+@receiver(post_save, sender=StopTime)
+@receiver(post_delete, sender=StopTime)
+def reset_stop_time_index(sender, instance, **kwargs):
+    reset_indexes(schedule_ids=[instance.schedule_id])
+    touch_stop_days([instance.arrival_time])
+
+
+@receiver(post_save, sender=Bus)
+@receiver(post_delete, sender=Bus)
+def log_bus_change(sender, instance, **kwargs):
+    record_changes(ChangeLog.BUS, [instance.pk])
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+@receiver(post_save, sender=RouteStop)
+@receiver(post_delete, sender=RouteStop)
+def log_route_change(sender, instance, **kwargs):
+    record_changes(ChangeLog.ROUTE, [instance.pk if sender is Route else instance.route_id])
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=StopTime)
+@receiver(post_delete, sender=StopTime)
+def log_schedule_change(sender, instance, **kwargs):
+    record_changes(ChangeLog.SCHEDULE, [instance.pk if sender is Schedule else instance.schedule_id])
@@ -0,0 +1,70 @@
+import re
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .arrivals import reset_indexes
+from .models import RouteStop, StopTime
+
+
+def split_stops(text):
+    """Stop names from the free-text ``Route.stops`` (comma, semicolon or newline separated)."""
+    return [name.strip() for name in re.split(r'[,;\n]+', text or '') if name.strip()]
+
+
+def set_route_stops(route, stops):
+    """
+    Replace the stops of ``route`` with ``stops``, a list of dicts with a
+    ``name`` and optional ``latitude``/``longitude``, in travel order, and
+    rewrite ``route.stops`` to match.
+    """
+    with transaction.atomic():
+        route.route_stops.all().delete()
+        RouteStop.objects.bulk_create([
+            RouteStop(
+                route=route,
+                name=stop['name'],
+                sequence=sequence,
+                latitude=stop.get('latitude'),
+                longitude=stop.get('longitude'),
+            )
+            for sequence, stop in enumerate(stops, start=1)
+        ])
+        route.stops = ', '.join(stop['name'] for stop in stops)
+        route.save(update_fields=['stops'])
+        # Stop coordinates feed the arrival matcher's cached indexes
+        transaction.on_commit(reset_indexes)
+
+
+def set_route_stops_from_text(route, text):
+    """Parse ``text`` into the route's stops, keeping known coordinates of stops that stay."""
+    known = {
+        name: (latitude, longitude)
+        for name, latitude, longitude in route.route_stops.values_list('name', 'latitude', 'longitude')
+    }
+    stops = []
+    for name in split_stops(text):
+        latitude, longitude = known.get(name, (None, None))
+        stops.append({'name': name, 'latitude': latitude, 'longitude': longitude})
+    set_route_stops(route, stops)
+
+
+def upcoming_departures(stop_name, window_minutes, now=None, limit=None):
+    """
+    Upcoming StopTimes at ``stop_name`` within the next ``window_minutes``,
+    soonest first, with their schedule, route and bus loaded. Served by the
+    (stop_name, arrival_time) index.
+    """
+    now = now or timezone.now()
+    departures = (
+        StopTime.objects.filter(
+            stop_name=stop_name,
+            arrival_time__gte=now,
+            arrival_time__lte=now + timedelta(minutes=window_minutes),
+            stop_status='upcoming',
+        )
+        .select_related('schedule__route', 'schedule__bus')
+        .order_by('arrival_time', 'pk')
+    )
+    return departures[:limit] if limit else departures
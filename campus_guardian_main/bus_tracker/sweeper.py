@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .analytics import touch_stop_days
+from .arrivals import DEFAULT_SCHEDULE_GRACE_MINUTES
+from .models import ChangeLog, StopTime
+from .sync import record_changes
+
+DEFAULT_GRACE_MINUTES = 10
+DEFAULT_LOOKBACK_HOURS = 24
+
+
+def _days_between(start, end):
+    start, end = timezone.localdate(start), timezone.localdate(end)
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def sweep_stop_statuses(now=None, grace_minutes=None):
+    """
+    Bring StopTime.stop_status up to date for the whole fleet with set-based
+    UPDATEs instead of per-row ``update_status()`` saves:
+
+    * upcoming stops with no arrival become 'skipped' once their whole trip
+      ended more than ``STOP_SKIP_GRACE_MINUTES`` ago, and no sooner than
+      arrival matching gives up on the trip, so late buses still arrive;
+    * stops with an actual arrival scheduled in the last
+      ``STOP_STATUS_LOOKBACK_HOURS`` become 'arrived'.
+
+    Both statements are range scans on the (stop_status, arrival_time) index,
+    so the query count doesn't depend on fleet size. Returns
+    ``(skipped, arrived)`` row counts.
+    """
+    now = now or timezone.now()
+    if grace_minutes is None:
+        grace_minutes = getattr(settings, 'STOP_SKIP_GRACE_MINUTES', DEFAULT_GRACE_MINUTES)
+    # Arrivals are matched until STOP_MATCH_SCHEDULE_GRACE_MINUTES after the trip ends
+    grace_minutes = max(grace_minutes, getattr(
+        settings, 'STOP_MATCH_SCHEDULE_GRACE_MINUTES', DEFAULT_SCHEDULE_GRACE_MINUTES
+    ))
+    cutoff = now - timedelta(minutes=grace_minutes)
+    lookback = timedelta(hours=getattr(settings, 'STOP_STATUS_LOOKBACK_HOURS', DEFAULT_LOOKBACK_HOURS))
+
+    overdue = StopTime.objects.filter(
+        stop_status='upcoming',
+        arrival_time__lt=cutoff,
+        schedule__arrival_time__lt=cutoff,
+        actual_arrival_time__isnull=True,
+    )
+    arrived = StopTime.objects.filter(
+        stop_status__in=['upcoming', 'skipped'],
+        arrival_time__gte=now - lookback,
+        actual_arrival_time__isnull=False,
+    )
+
+    with transaction.atomic():
+        # The affected schedules and the span of their days are all that cached
+        # reports and the sync change log need
+        spans = [
+            span
+            for queryset in (overdue, arrived)
+            for span in queryset.order_by().values('schedule_id').annotate(
+                first=Min('arrival_time'), last=Max('arrival_time')
+            )
+        ]
+        skipped_count = overdue.update(stop_status='skipped')
+        arrived_count = arrived.update(stop_status='arrived')
+
+        if spans:
+            touch_stop_days(_days_between(
+                min(span['first'] for span in spans), max(span['last'] for span in spans)
+            ))
+        record_changes(ChangeLog.SCHEDULE, (span['schedule_id'] for span in spans))
+
+    return skipped_count, arrived_count
@@ -0,0 +1,182 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Bus, ChangeLog, Route, Schedule
+
+DEFAULT_MAX_CHANGES = 5000
+DEFAULT_CHANGE_LOG_DAYS = 30
+DEFAULT_SETTLE_SECONDS = 5
+DEFAULT_SNAPSHOT_PAGE_SIZE = 500
+LOG_BATCH_SIZE = 1000
+ID_BATCH_SIZE = 500
+
+# Queryset for each logged kind, loading what its sync payload needs
+SYNCED = {
+    ChangeLog.BUS: lambda: Bus.objects.all(),
+    ChangeLog.ROUTE: lambda: Route.objects.prefetch_related('route_stops'),
+    ChangeLog.SCHEDULE: lambda: Schedule.objects.select_related('route').prefetch_related('stop_times'),
+}
+
+
+def record_changes(kind, ids):
+    """
+    Log changes to the ``kind`` objects with ``ids`` once the current
+    transaction commits, so rolled back writes are never reported. Model
+    signals cover single saves and deletes; call this after bulk writes.
+    """
+    ids = sorted({pk for pk in ids if pk is not None})
+    if ids:
+        transaction.on_commit(lambda: ChangeLog.objects.bulk_create(
+            [ChangeLog(kind=kind, object_id=pk) for pk in ids], batch_size=LOG_BATCH_SIZE
+        ))
+
+
+def latest_token():
+    return ChangeLog.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def _settle_horizon():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', DEFAULT_SETTLE_SECONDS))
+
+
+def _settled_token():
+    """
+    Newest id that is safe to hand out. Ids are assigned on insert but only
+    become visible on commit, so a lower id can still show up after a
+    higher one. Log rows are written in short transactions of their own,
+    so nothing older than the settle horizon is still pending.
+    """
+    return (
+        ChangeLog.objects.filter(changed_at__lte=_settle_horizon())
+        .order_by('-pk').values_list('pk', flat=True).first() or 0
+    )
+
+
+def _is_expired(since):
+    oldest = ChangeLog.objects.order_by('pk').values_list('pk', flat=True).first()
+    return oldest is not None and since < oldest - 1
+
+
+def _in_bulk(kind, ids):
+    ids = sorted(ids)
+    objects = []
+    for offset in range(0, len(ids), ID_BATCH_SIZE):
+        objects.extend(SYNCED[kind]().filter(pk__in=ids[offset:offset + ID_BATCH_SIZE]).order_by('pk'))
+    return objects
+
+
+def parse_token(value):
+    """
+    Split a token from a previous response into ``(since, snapshot)``.
+    ``snapshot`` is None for a delta token, else the ``(kind, last_pk)`` a
+    paged snapshot stopped at. Raises ValueError for anything else.
+    """
+    if not value:
+        return 0, None
+    parts = str(value).split('.')
+    if len(parts) == 1:
+        since, snapshot = int(parts[0]), None
+    elif len(parts) == 3 and parts[1] in SYNCED:
+        since, snapshot = int(parts[0]), (parts[1], int(parts[2]))
+    else:
+        raise ValueError(value)
+    if since < 0:
+        raise ValueError(value)
+    return since, snapshot
+
+
+def _snapshot_page(since, kind, after, page_size):
+    kinds = list(SYNCED)
+    objects = {name: [] for name in kinds}
+    remaining = page_size
+    for name in kinds[kinds.index(kind):]:
+        # One extra row tells whether the snapshot goes on past this page
+        page = list(SYNCED[name]().filter(pk__gt=after).order_by('pk')[:remaining + 1])
+        objects[name] = page[:remaining]
+        if len(page) > remaining:
+            return objects, f'{since}.{name}.{objects[name][-1].pk if objects[name] else after}'
+        remaining -= len(page)
+        after = 0
+    return objects, None
+
+
+def changes_since(token=None, limit=None):
+    """
+    Objects changed after ``token``, the token of a previous response.
+
+    Returns a dict with the next ``token``, ``objects`` and ``deleted`` ids
+    per kind, ``more`` when the client should call again straight away and
+    ``reset`` when a full snapshot starts instead of a delta. A snapshot is
+    sent when ``token`` is missing or older than the pruned change log; the
+    client then replaces its local copy. Snapshots are paged by
+    ``SYNC_SNAPSHOT_PAGE_SIZE`` objects and end with a delta token taken
+    before the first page, so changes made meanwhile are sent again.
+
+    A delta reads at most ``limit`` (``SYNC_MAX_CHANGES``) changes, and only
+    those older than ``SYNC_SETTLE_SECONDS``, so no change is skipped while
+    an earlier id is still being committed. It costs one range scan of the
+    log plus one query per changed kind, so it scales with the number of
+    changes rather than the timetable. Raises ValueError for a malformed
+    token.
+    """
+    since, snapshot = parse_token(token)
+    limit = limit or getattr(settings, 'SYNC_MAX_CHANGES', DEFAULT_MAX_CHANGES)
+    page_size = getattr(settings, 'SYNC_SNAPSHOT_PAGE_SIZE', DEFAULT_SNAPSHOT_PAGE_SIZE)
+
+    reset = snapshot is None and (not since or _is_expired(since))
+    if reset:
+        # Take the token first: anything written meanwhile is sent again by the next delta
+        since, snapshot = _settled_token(), (next(iter(SYNCED)), 0)
+    if snapshot is not None:
+        objects, next_token = _snapshot_page(since, *snapshot, page_size)
+        return {
+            "token": next_token or str(since),
+            "reset": reset,
+            "more": next_token is not None,
+            "objects": objects,
+            "deleted": {kind: [] for kind in SYNCED},
+        }
+
+    horizon = _settle_horizon()
+    changes = list(
+        ChangeLog.objects.filter(pk__gt=since).order_by('pk')
+        .values_list('pk', 'kind', 'object_id', 'changed_at')[:limit]
+    )
+    read = len(changes)
+    for position, (_, _, _, changed_at) in enumerate(changes):
+        if changed_at > horizon:
+            changes = changes[:position]
+            break
+
+    changed = {kind: set() for kind in SYNCED}
+    for _, kind, object_id, _ in changes:
+        changed[kind].add(object_id)
+
+    objects, deleted = {}, {}
+    for kind, ids in changed.items():
+        objects[kind] = _in_bulk(kind, ids) if ids else []
+        # Anything logged that no longer exists was deleted
+        deleted[kind] = sorted(ids - {obj.pk for obj in objects[kind]})
+
+    return {
+        "token": str(changes[-1][0] if changes else since),
+        "reset": False,
+        "more": read == limit and len(changes) == read,
+        "objects": objects,
+        "deleted": deleted,
+    }
+
+
+def prune_change_log(now=None):
+    """
+    Delete change log rows older than ``SYNC_CHANGE_LOG_DAYS``. The newest row
+    is always kept so expired tokens can still be told apart. Clients holding
+    a pruned token get a full snapshot. Returns the number of rows deleted.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=getattr(settings, 'SYNC_CHANGE_LOG_DAYS', DEFAULT_CHANGE_LOG_DAYS))
+    deleted, _ = ChangeLog.objects.filter(changed_at__lt=cutoff, pk__lt=latest_token()).delete()
+    return deleted
@@ -1,3 +1,322 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .arrivals import detect_arrivals, reset_indexes
+from .conflicts import conflict_report
+from .eta import get_delay_table, reset_delay_table
+from .gps_filter import get_last_fixes
+from .live import get_backend
+from .sweeper import sweep_stop_statuses
+from .timetable import generate_schedules
+from .models import Bus, ChangeLog, Driver, Route, RouteStop, Schedule, ScheduleTemplate, StopTime, GPSLog
+
+
+class BusListQueryCountTests(TestCase):
+    """Serializing buses must cost the same number of queries for any fleet size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.route = Route.objects.create(name="Main", start_point="Gate", end_point="Library", stops="Gate, Hostel, Library")
+
+    def setUp(self):
+        # The ETA delay table is loaded once per process, not per request
+        reset_delay_table()
+        get_delay_table()
+
+    def add_buses(self, count):
+        now = timezone.now()
+        for _ in range(count):
+            index = Bus.objects.count()
+            bus = Bus.objects.create(plate_number=f"KA-{index:04d}", model="Volvo", capacity=40, status="active")
+            Driver.objects.create(name=f"Driver {index}", license_no=f"DL-{index}", assigned_bus=bus)
+            for offset in (-2, 2):
+                schedule = Schedule.objects.create(
+                    route=self.route,
+                    bus=bus,
+                    departure_time=now + timedelta(hours=offset),
+                    arrival_time=now + timedelta(hours=offset, minutes=45),
+                )
+                for minutes in (0, 15, 30):
+                    StopTime.objects.create(
+                        schedule=schedule,
+                        stop_name=f"Stop {minutes}",
+                        arrival_time=schedule.departure_time + timedelta(minutes=minutes),
+                    )
+            GPSLog.objects.create(bus=bus, latitude=12.97, longitude=77.59)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_bus_list_query_count_is_constant(self):
+        self.add_buses(2)
+        small, _ = self.count_queries('/api/bus_tracker/buses/')
+
+        self.add_buses(8)
+        large, data = self.count_queries('/api/bus_tracker/buses/')
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(data['results']), 10)
+        bus = data['results'][0]
+        self.assertEqual(len(bus['last_trip']['stop_times']), 3)
+        self.assertEqual(bus['next_trip']['route']['name'], "Main")
+        self.assertIsNotNone(bus['driver'])
+
+    def test_bus_detail_query_count(self):
+        self.add_buses(1)
+        bus = Bus.objects.get()
+        count, data = self.count_queries(f'/api/bus_tracker/buses/{bus.pk}/')
+
+        self.assertLessEqual(count, 4)
+        self.assertLess(data['last_trip']['departure_time'], data['next_trip']['departure_time'])
+
+    def test_gpslog_list_query_count_is_constant(self):
+        self.add_buses(2)
+        small, _ = self.count_queries('/api/bus_tracker/gpslogs/')
+
+        self.add_buses(8)
+        large, data = self.count_queries('/api/bus_tracker/gpslogs/')
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(data['results']), 10)
+
+
+class BusTrackTests(TestCase):
+    def setUp(self):
+        self.bus = Bus.objects.create(plate_number="ABC-123", model="Coach", capacity=40, status="active")
+
+    def get(self, action, start, end):
+        return APIClient().get(
+            f'/api/bus_tracker/buses/{self.bus.pk}/{action}/', {'from': start.isoformat(), 'to': end.isoformat()}
+        )
+
+    def test_track_rejects_inverted_and_long_ranges(self):
+        now = timezone.now()
+
+        self.assertEqual(self.get('track', now - timedelta(days=1), now).status_code, 200)
+        self.assertEqual(self.get('track', now, now - timedelta(days=1)).status_code, 400)
+        self.assertEqual(self.get('track', now - timedelta(days=30), now).status_code, 400)
+        self.assertEqual(self.get('export', now, now - timedelta(days=1)).status_code, 400)
+
+
+class GPSIngestTests(TestCase):
+    def setUp(self):
+        # Last fixes are kept per process, and bus ids are reused between tests
+        get_backend().clear()
+        get_last_fixes().clear()
+        self.client = APIClient()
+        self.bus = Bus.objects.create(plate_number="ABC-123", model="Coach", capacity=40, status="active")
+
+    def ingest(self, fixes):
+        return self.client.post('/api/bus_tracker/gpslogs/ingest/', fixes, format='json')
+
+    def fix(self, latitude=6.9, longitude=79.9, **extra):
+        return {'bus_id': self.bus.pk, 'latitude': latitude, 'longitude': longitude, **extra}
+
+    def test_live_poll_resends_positions_stamped_just_before_since(self):
+        self.ingest([self.fix()])
+        updated_at = get_backend().get_all()[0]['updated_at']
+
+        # A poll that read the store just before this merge landed returned a later generated_at
+        response = self.client.get('/api/bus_tracker/live/', {'since': (updated_at + timedelta(seconds=1)).isoformat()})
+
+        self.assertEqual([bus['bus_id'] for bus in response.json()['buses']], [self.bus.pk])
+
+    def test_out_of_range_timestamp_rejects_only_that_fix(self):
+        response = self.ingest([self.fix(timestamp=1e20), self.fix()])
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['rejected'], [{'index': 0, 'error': 'Invalid timestamp'}])
+        self.assertEqual(GPSLog.objects.count(), 1)
+
+    def test_future_fix_is_rejected_and_does_not_block_the_bus(self):
+        now = timezone.now()
+        future = self.ingest([self.fix(timestamp=(now + timedelta(days=3650)).isoformat())])
+        single = self.client.post('/api/bus_tracker/gpslogs/', {
+            'bus_id': self.bus.pk, 'latitude': 6.9, 'longitude': 79.9,
+            'timestamp': (now + timedelta(days=3650)).isoformat(), 'log_type': 'entry',
+        }, format='json')
+        current = self.ingest([self.fix(timestamp=now.isoformat())])
+
+        self.assertEqual(future.json()['rejected'], [{'index': 0, 'error': 'Timestamp is in the future'}])
+        self.assertEqual(single.status_code, 400)
+        self.assertEqual(current.json()['accepted'], 1)
+        self.assertEqual(GPSLog.objects.get().timestamp, now)
+
+    def test_impossible_jump_is_rejected(self):
+        now = timezone.now()
+        response = self.ingest([
+            self.fix(timestamp=now.isoformat()),
+            # ~11 km in 10 seconds
+            self.fix(latitude=7.0, timestamp=(now + timedelta(seconds=10)).isoformat()),
+            self.fix(latitude=6.901, timestamp=(now + timedelta(seconds=20)).isoformat()),
+        ])
+
+        data = response.json()
+        self.assertEqual(data['accepted'], 2)
+        self.assertEqual([item['index'] for item in data['rejected']], [1])
+        self.assertTrue(data['rejected'][0]['error'].startswith('Implied speed'))
+
+    def test_stationary_jitter_is_collapsed_until_keepalive(self):
+        now = timezone.now()
+        response = self.ingest([
+            self.fix(timestamp=now.isoformat()),
+            self.fix(latitude=6.90002, timestamp=(now + timedelta(seconds=10)).isoformat()),
+            self.fix(latitude=6.90001, timestamp=(now + timedelta(seconds=20)).isoformat()),
+            self.fix(latitude=6.90002, timestamp=(now + timedelta(seconds=90)).isoformat()),
+        ])
+
+        self.assertEqual(response.json(), {'accepted': 2, 'collapsed': 2, 'rejected': []})
+        self.assertEqual(GPSLog.objects.count(), 2)
+
+
+class ArrivalDetectionTests(TestCase):
+    def setUp(self):
+        reset_indexes()
+        self.bus = Bus.objects.create(plate_number="ABC-123", model="Coach", capacity=40, status="active")
+        self.route = Route.objects.create(name="Loop", start_point="Gate", end_point="Gate", stops="Gate, Library")
+        RouteStop.objects.create(route=self.route, name="Gate", sequence=1, latitude=6.90, longitude=79.90)
+        RouteStop.objects.create(route=self.route, name="Library", sequence=2, latitude=6.91, longitude=79.90)
+
+    def add_trip(self, departure, minutes=20):
+        schedule = Schedule.objects.create(
+            route=self.route, bus=self.bus, departure_time=departure,
+            arrival_time=departure + timedelta(minutes=minutes),
+        )
+        for offset, name in ((0, "Gate"), (minutes, "Library")):
+            StopTime.objects.create(schedule=schedule, stop_name=name, arrival_time=departure + timedelta(minutes=offset))
+        return schedule
+
+    def test_back_to_back_trips_match_the_running_trip(self):
+        now = timezone.now()
+        finished = self.add_trip(now - timedelta(minutes=30))
+        finished.stop_times.update(stop_status='arrived', actual_arrival_time=now - timedelta(minutes=10))
+        running = self.add_trip(now - timedelta(minutes=5))
+
+        arrived = detect_arrivals([GPSLog(bus=self.bus, latitude=6.91, longitude=79.90, timestamp=now)])
+
+        self.assertEqual(arrived, 1)
+        self.assertEqual(running.stop_times.get(stop_name="Library").stop_status, 'arrived')
+
+    def test_sweep_leaves_late_buses_to_arrive(self):
+        now = timezone.now()
+        late = self.add_trip(now - timedelta(minutes=70), minutes=55)
+
+        sweep_stop_statuses(now)
+        arrived = detect_arrivals([GPSLog(bus=self.bus, latitude=6.91, longitude=79.90, timestamp=now)])
+
+        self.assertEqual(arrived, 1)
+        library = late.stop_times.get(stop_name="Library")
+        self.assertEqual((library.stop_status, library.actual_arrival_time), ('arrived', now))
+
+
+class TimetableConflictTests(TestCase):
+    def setUp(self):
+        self.bus = Bus.objects.create(plate_number="ABC-123", model="Coach", capacity=40, status="active")
+        self.route = Route.objects.create(name="Loop", start_point="Gate", end_point="Gate", stops="Gate")
+        self.day = date(2024, 3, 4)  # a Monday
+
+    def add_template(self, departure):
+        return ScheduleTemplate.objects.create(
+            route=self.route, bus=self.bus, days_of_week='0', departure_time=departure, duration_minutes=60,
+        )
+
+    def test_clashing_templates_keep_the_earlier_trip(self):
+        first = self.add_template(time(8, 0))
+        second = self.add_template(time(8, 30))
+
+        schedules, _, conflicts = generate_schedules(self.day, self.day)
+
+        self.assertEqual(schedules, 1)
+        self.assertEqual(Schedule.objects.get().template, first)
+        self.assertEqual(conflicts, [{
+            "template_id": second.pk, "service_date": self.day,
+            "conflicts_with": None, "conflicts_with_template_id": first.pk,
+        }])
+
+    def test_booked_trip_wins_over_generated_ones(self):
+        booked = Schedule.objects.create(
+            route=self.route, bus=self.bus,
+            departure_time=timezone.make_aware(datetime.combine(self.day, time(8, 45))),
+            arrival_time=timezone.make_aware(datetime.combine(self.day, time(9, 15))),
+        )
+        self.add_template(time(8, 0))
+        later = self.add_template(time(9, 30))
+
+        schedules, _, conflicts = generate_schedules(self.day, self.day)
+
+        self.assertEqual(schedules, 1)
+        self.assertEqual(Schedule.objects.exclude(pk=booked.pk).get().template, later)
+        self.assertEqual(conflicts[0]["conflicts_with"], booked.pk)
+
+    def test_report_lists_every_overlapping_pair(self):
+        start = timezone.make_aware(datetime.combine(self.day, time(6, 0)))
+        a, b, c = (
+            Schedule.objects.create(
+                route=self.route, bus=self.bus,
+                departure_time=start + timedelta(minutes=departs), arrival_time=start + timedelta(minutes=arrives),
+            )
+            for departs, arrives in ((0, 600), (60, 180), (120, 240))
+        )
+
+        pairs = [(item["first"]["id"], item["second"]["id"]) for item in conflict_report(start, start + timedelta(days=1))]
+
+        self.assertEqual(pairs, [(a.pk, b.pk), (a.pk, c.pk), (b.pk, c.pk)])
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def sync(self, since=None):
+        url = '/api/bus_tracker/sync/' + (f'?since={since}' if since is not None else '')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def add_bus(self, plate):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Bus.objects.create(plate_number=plate, model="Coach", capacity=40, status="active")
+
+    def settle(self):
+        ChangeLog.objects.update(changed_at=timezone.now() - timedelta(minutes=1))
+
+    def test_changes_are_only_handed_out_once_settled(self):
+        self.add_bus("ABC-1")
+        self.settle()
+        token = self.sync()['token']
+        bus = self.add_bus("ABC-2")
+
+        pending = self.sync(token)
+        self.assertEqual((pending['token'], pending['buses']), (token, []))
+
+        self.settle()
+        settled = self.sync(token)
+        self.assertEqual([item['id'] for item in settled['buses']], [bus.pk])
+        self.assertNotEqual(settled['token'], token)
+
+    @override_settings(SYNC_SNAPSHOT_PAGE_SIZE=2)
+    def test_snapshot_is_paged(self):
+        buses = [self.add_bus(f"ABC-{n}") for n in range(3)]
+        Route.objects.create(name="Loop", start_point="Gate", end_point="Gate", stops="Gate")
+        self.settle()
+
+        first = self.sync()
+        self.assertEqual((first['reset'], first['more']), (True, True))
+        self.assertEqual([item['id'] for item in first['buses']], [bus.pk for bus in buses[:2]])
+
+        last = self.sync(first['token'])
+        self.assertEqual((last['reset'], last['more']), (False, False))
+        self.assertEqual([item['id'] for item in last['buses']], [buses[2].pk])
+        self.assertEqual(len(last['routes']), 1)
+        self.assertEqual(last['token'], str(ChangeLog.objects.latest('pk').pk))
+
+    def test_malformed_token_is_rejected(self):
+        self.assertEqual(self.client.get('/api/bus_tracker/sync/?since=1.trains.3').status_code, 400)
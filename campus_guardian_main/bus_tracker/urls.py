@@ -1,14 +1,23 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BusViewSet, DriverViewSet, RouteViewSet, ScheduleViewSet, GPSLogViewSet
+from .views import (
+    BusViewSet, DriverViewSet, RouteViewSet, ScheduleViewSet, ScheduleTemplateViewSet, GPSLogViewSet, LivePositionView,
+    NearbyBusesView, OnTimePerformanceView, StopDeparturesView, SyncView,
+)
 
 router = DefaultRouter()
 router.register(r'buses', BusViewSet)
 router.register(r'drivers', DriverViewSet)
 router.register(r'routes', RouteViewSet)
 router.register(r'schedules', ScheduleViewSet)
+router.register(r'schedule-templates', ScheduleTemplateViewSet)
 router.register(r'gpslogs', GPSLogViewSet)
 
 urlpatterns = [
+    path('live/', LivePositionView.as_view(), name='bus-live'),
+    path('nearby/', NearbyBusesView.as_view(), name='bus-nearby'),
+    path('analytics/on-time/', OnTimePerformanceView.as_view(), name='on-time-performance'),
+    path('stops/<str:stop>/departures/', StopDeparturesView.as_view(), name='stop-departures'),
+    path('sync/', SyncView.as_view(), name='sync'),
     path('', include(router.urls)),
 ]
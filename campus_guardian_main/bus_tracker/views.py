@@ -1,23 +1,140 @@
+from datetime import date, timedelta
+
+from django.db.models import OuterRef, Subquery
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .analytics import DIMENSIONS, MAX_PERIOD_DAYS, on_time_performance
+from .conflicts import conflict_report
+from .eta import predict_arrival
+from .export import iter_gps_export
+from .geo import encode_polyline, path_length_m, simplify
+from .ingest import IngestError, ingest_fixes
+from .live import live_positions, nearby_positions
+from .models import Bus, ChangeLog, Driver, Route, RouteStop, Schedule, ScheduleTemplate, GPSLog, StopTime
+from .retention import track_points
+from .serializers import (
+    BusSerializer, BusSummarySerializer, DriverSerializer, RouteSerializer, ScheduleSerializer,
+    ScheduleTemplateSerializer, GPSLogSerializer,
+)
+from .stops import upcoming_departures
+from .sync import changes_since
+from .timetable import generate_schedules
+
+
+TRACK_DEFAULT_TOLERANCE_M = 5
+TRACK_MAX_TOLERANCE_M = 1000
+TRACK_MAX_SPAN = timedelta(days=7)  # every fix in the span is held in memory to simplify
+
+
+def parse_time_param(value, default=None):
+    """Parse an ISO-8601 query param into an aware datetime, raising ValueError if invalid."""
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
-from .models import Bus, Driver, Route, Schedule, GPSLog
-from .serializers import BusSerializer, DriverSerializer, RouteSerializer, ScheduleSerializer, GPSLogSerializer
 
 class BusViewSet(viewsets.ModelViewSet):
     queryset = Bus.objects.all()
     serializer_class = BusSerializer
 
+    def get_queryset(self):
+        # Trip and driver ids ride along on the page query, see load_bus_trips
+        return Bus.objects.with_trip_ids()
+
+    @action(detail=True, methods=['get'])
+    def track(self, request, pk=None):
+        """
+        Path of one bus between ?from= and ?to= (default: the last 24 hours, at
+        most ``TRACK_MAX_SPAN``) as an encoded polyline, simplified to ?tolerance= metres, with distance,
+        duration and average speed computed over every fix.
+        """
+        bus = get_object_or_404(Bus, pk=pk)
+        try:
+            end = parse_time_param(request.query_params.get('to'), timezone.now())
+            start = parse_time_param(request.query_params.get('from'), end - timedelta(days=1))
+        except ValueError:
+            return Response({"error": "Invalid from or to, expected ISO-8601"}, status=status.HTTP_400_BAD_REQUEST)
+        if start >= end or end - start > TRACK_MAX_SPAN:
+            return Response(
+                {"error": f"from must be before to, at most {TRACK_MAX_SPAN.days} days apart"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            tolerance = float(request.query_params.get('tolerance', TRACK_DEFAULT_TOLERANCE_M))
+        except ValueError:
+            return Response({"error": "tolerance must be a number of metres"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= tolerance <= TRACK_MAX_TOLERANCE_M:
+            return Response(
+                {"error": f"tolerance must be between 0 and {TRACK_MAX_TOLERANCE_M} metres"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        latitudes, longitudes = [], []
+        first_fix = last_fix = None
+        for timestamp, latitude, longitude, _ in track_points(bus.pk, start, end):
+            latitudes.append(latitude)
+            longitudes.append(longitude)
+            first_fix = first_fix or timestamp
+            last_fix = timestamp
+
+        kept = simplify(latitudes, longitudes, tolerance)
+        distance = path_length_m(latitudes, longitudes)
+        duration = (last_fix - first_fix).total_seconds() if first_fix else 0
+        return Response({
+            "bus_id": bus.pk,
+            "from": start,
+            "to": end,
+            "tolerance": tolerance,
+            "polyline": encode_polyline([latitudes[i] for i in kept], [longitudes[i] for i in kept]),
+            "points": len(kept),
+            "raw_points": len(latitudes),
+            "first_fix": first_fix,
+            "last_fix": last_fix,
+            "distance_m": round(distance, 1),
+            "duration_s": round(duration),
+            "average_speed_kmh": round(distance / duration * 3.6, 1) if duration else None,
+        })
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """GPS history between ?from= and ?to= as a streamed columnar binary file, see export.py."""
+        bus = get_object_or_404(Bus, pk=pk)
+        try:
+            end = parse_time_param(request.query_params.get('to'), timezone.now())
+            start = parse_time_param(request.query_params.get('from'), end - timedelta(days=1))
+        except ValueError:
+            return Response({"error": "Invalid from or to, expected ISO-8601"}, status=status.HTTP_400_BAD_REQUEST)
+        if start >= end:
+            return Response({"error": "from must be before to"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(iter_gps_export(bus.pk, start, end), content_type='application/octet-stream')
+        response['Content-Disposition'] = (
+            f'attachment; filename="bus-{bus.pk}-{start:%Y%m%dT%H%M%S}-{end:%Y%m%dT%H%M%S}.cggps"'
+        )
+        return response
+
 class DriverViewSet(viewsets.ModelViewSet):
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
 
 class RouteViewSet(viewsets.ModelViewSet):
-    queryset = Route.objects.all()
+    queryset = Route.objects.prefetch_related('route_stops')
     serializer_class = RouteSerializer
 
 class ScheduleViewSet(viewsets.ModelViewSet):
-    queryset = Schedule.objects.all()
+    queryset = Schedule.objects.select_related('route').prefetch_related('stop_times')
     serializer_class = ScheduleSerializer
 
     def create(self, request, *args, **kwargs):
@@ -29,6 +146,255 @@ class ScheduleViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """Double-booked buses between ?from= and ?to= (default: the next 30 days)."""
+        try:
+            start = parse_time_param(request.query_params.get('from'), timezone.now())
+            end = parse_time_param(request.query_params.get('to'), start + timedelta(days=30))
+        except ValueError:
+            return Response({"error": "Invalid from or to, expected ISO-8601"}, status=status.HTTP_400_BAD_REQUEST)
+        if start >= end:
+            return Response({"error": "from must be before to"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"from": start, "to": end, "conflicts": conflict_report(start, end)})
+
+class ScheduleTemplateViewSet(viewsets.ModelViewSet):
+    queryset = ScheduleTemplate.objects.prefetch_related('stops')
+    serializer_class = ScheduleTemplateSerializer
+
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """
+        Expand templates into schedules for {"from": "YYYY-MM-DD", "to": "YYYY-MM-DD"}.
+        An optional "templates" list limits the run to those ids; existing trips are kept.
+        """
+        try:
+            start = date.fromisoformat(str(request.data.get('from')))
+            end = date.fromisoformat(str(request.data.get('to')))
+        except ValueError:
+            return Response({"error": "from and to are required, expected YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"error": "from must be on or before to"}, status=status.HTTP_400_BAD_REQUEST)
+
+        templates = ScheduleTemplate.objects.filter(is_active=True)
+        template_ids = request.data.get('templates')
+        if template_ids is not None:
+            if not isinstance(template_ids, list):
+                return Response({"error": "templates must be a list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+            templates = templates.filter(pk__in=template_ids)
+
+        schedules_created, stop_times_created, conflicts = generate_schedules(start, end, templates)
+        return Response(
+            {
+                "from": start,
+                "to": end,
+                "schedules_created": schedules_created,
+                "stop_times_created": stop_times_created,
+                "conflicts": conflicts,
+            },
+            status=status.HTTP_201_CREATED if schedules_created else status.HTTP_200_OK,
+        )
+
+class LivePositionView(APIView):
+    """Latest known position of every bus, served from the live store."""
+
+    def get(self, request):
+        try:
+            since = parse_time_param(request.query_params.get('since'))
+        except ValueError:
+            return Response({"error": "Invalid since, expected ISO-8601"}, status=status.HTTP_400_BAD_REQUEST)
+
+        positions = live_positions(since)
+        # Taken after the read: clients pass it back as ?since=
+        generated_at = timezone.now()
+        return Response({
+            "generated_at": generated_at,
+            "buses": [
+                {
+                    "bus_id": position['bus_id'],
+                    "latitude": position['latitude'],
+                    "longitude": position['longitude'],
+                    "timestamp": position['timestamp'],
+                    "log_type": position['log_type'],
+                }
+                for position in positions
+            ],
+        })
+
+
+class NearbyBusesView(APIView):
+    """The ?limit= buses nearest to ?lat=&lng= within ?radius= metres, with their next stop."""
+
+    DEFAULT_RADIUS = 1000
+    MAX_RADIUS = 20000
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+
+    def get(self, request):
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            radius = float(request.query_params.get('radius', self.DEFAULT_RADIUS))
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except KeyError:
+            return Response({"error": "lat and lng are required"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "lat, lng, radius and limit must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({"error": "lat or lng out of range"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < radius <= self.MAX_RADIUS or not 1 <= limit <= self.MAX_LIMIT:
+            return Response(
+                {"error": f"radius must be up to {self.MAX_RADIUS} metres and limit between 1 and {self.MAX_LIMIT}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        nearby = nearby_positions(lat, lng, radius, limit)
+        now = timezone.now()
+        next_stop = (
+            StopTime.objects.filter(schedule__bus=OuterRef('pk'), stop_status='upcoming', arrival_time__gte=now)
+            .order_by('arrival_time', 'pk').values('pk')[:1]
+        )
+        buses = Bus.objects.annotate(next_stop_id=Subquery(next_stop)).in_bulk(
+            [position['bus_id'] for _, position in nearby]
+        )
+        stops = StopTime.objects.select_related('schedule__route').in_bulk(
+            [bus.next_stop_id for bus in buses.values() if bus.next_stop_id]
+        )
+
+        results = []
+        for distance, position in nearby:
+            bus = buses.get(position['bus_id'])
+            if bus is None:
+                continue
+            stop_time = stops.get(bus.next_stop_id)
+            results.append({
+                "bus_id": bus.pk,
+                "plate_number": bus.plate_number,
+                "latitude": position['latitude'],
+                "longitude": position['longitude'],
+                "timestamp": position['timestamp'],
+                "distance_m": round(distance, 1),
+                "next_stop": stop_time and {
+                    "stop_time_id": stop_time.pk,
+                    "stop_name": stop_time.stop_name,
+                    "schedule_id": stop_time.schedule_id,
+                    "route_name": stop_time.schedule.route.name,
+                    "arrival_time": stop_time.arrival_time,
+                    "predicted_arrival": predict_arrival(stop_time.schedule.route_id, stop_time),
+                },
+            })
+        return Response({"latitude": lat, "longitude": lng, "radius": radius, "buses": results})
+
+
+class StopDeparturesView(APIView):
+    """Departure board for one stop: routes serving it and trips due in the next ?window= minutes."""
+
+    DEFAULT_WINDOW = 60
+    MAX_WINDOW = 24 * 60
+    MAX_DEPARTURES = 100
+
+    def get(self, request, stop):
+        try:
+            window = int(request.query_params.get('window', self.DEFAULT_WINDOW))
+        except ValueError:
+            return Response({"error": "window must be a number of minutes"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= window <= self.MAX_WINDOW:
+            return Response(
+                {"error": f"window must be between 1 and {self.MAX_WINDOW} minutes"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        now = timezone.now()
+        routes = RouteStop.objects.filter(name=stop).select_related('route').order_by('route__name', 'sequence')
+        departures = upcoming_departures(stop, window, now, limit=self.MAX_DEPARTURES)
+        return Response({
+            "stop": stop,
+            "generated_at": now,
+            "window": window,
+            "routes": [
+                {"route_id": route_stop.route_id, "name": route_stop.route.name, "sequence": route_stop.sequence}
+                for route_stop in routes
+            ],
+            "departures": [
+                {
+                    "stop_time_id": stop_time.pk,
+                    "schedule_id": stop_time.schedule_id,
+                    "route_id": stop_time.schedule.route_id,
+                    "route_name": stop_time.schedule.route.name,
+                    "bus_id": stop_time.schedule.bus_id,
+                    "plate_number": stop_time.schedule.bus.plate_number,
+                    "arrival_time": stop_time.arrival_time,
+                    "predicted_arrival": predict_arrival(stop_time.schedule.route_id, stop_time),
+                }
+                for stop_time in departures
+            ],
+        })
+
+
+class SyncView(APIView):
+    """
+    Change feed for the driver app. Pass the ``token`` of the previous
+    response as ?since= to receive only buses, routes and schedules created,
+    changed or deleted after it; without one (or with an expired one) a full
+    snapshot starts with ``reset`` set. Keep calling while ``more`` is set.
+    """
+
+    SERIALIZERS = {
+        ChangeLog.BUS: ('buses', BusSummarySerializer),
+        ChangeLog.ROUTE: ('routes', RouteSerializer),
+        ChangeLog.SCHEDULE: ('schedules', ScheduleSerializer),
+    }
+
+    def get(self, request):
+        try:
+            changes = changes_since(request.query_params.get('since'))
+        except ValueError:
+            return Response({"error": "since must be a token from a previous sync"}, status=status.HTTP_400_BAD_REQUEST)
+
+        payload = {"token": changes['token'], "reset": changes['reset'], "more": changes['more'], "deleted": {}}
+        for kind, (name, serializer_class) in self.SERIALIZERS.items():
+            payload[name] = serializer_class(changes['objects'][kind], many=True).data
+            payload['deleted'][name] = changes['deleted'][kind]
+        return Response(payload)
+
+
+class OnTimePerformanceView(APIView):
+    """On-time rate, mean and p95 delay and skipped stops between ?from= and ?to= dates, grouped ?by=."""
+
+    def get(self, request):
+        dimension = request.query_params.get('by', 'route')
+        if dimension not in DIMENSIONS:
+            return Response(
+                {"error": f"by must be one of {', '.join(DIMENSIONS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            end = date.fromisoformat(request.query_params.get('to') or timezone.localdate().isoformat())
+            start = date.fromisoformat(request.query_params.get('from') or (end - timedelta(days=29)).isoformat())
+        except ValueError:
+            return Response({"error": "Invalid from or to, expected YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end or (end - start).days >= MAX_PERIOD_DAYS:
+            return Response(
+                {"error": f"from must be on or before to, at most {MAX_PERIOD_DAYS} days apart"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({"from": start, "to": end, "by": dimension, "results": on_time_performance(start, end, dimension)})
+
+
 class GPSLogViewSet(viewsets.ModelViewSet):
-    queryset = GPSLog.objects.all()
+    queryset = GPSLog.objects.select_related('bus')
     serializer_class = GPSLogSerializer
+
+    @action(detail=False, methods=['post'])
+    def ingest(self, request):
+        """Store a batch of fixes from one or many buses and return a compact ack."""
+        try:
+            logs, rejected, collapsed = ingest_fixes(request.data)
+        except IngestError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {"accepted": len(logs), "collapsed": collapsed, "rejected": rejected},
+            status=status.HTTP_201_CREATED if logs or collapsed else status.HTTP_400_BAD_REQUEST,
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communicationhub', '0009_announcement_alter_feedback_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voicetext',
+            index=models.Index(fields=['created_at'], name='communicati_created_428460_idx'),
+        ),
+    ]
@@ -11,6 +11,11 @@ class VoiceText(models.Model):
     transcription = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
     def __str__(self):
         return f"{self.title} by {self.user.username}"
 
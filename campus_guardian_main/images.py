@@ -0,0 +1,154 @@
+"""
+Resized variants of uploaded photos.
+
+Each image is decoded once, orientated from its EXIF tag and written out as
+a set of smaller variants (``thumb``, ``medium``) with all metadata dropped.
+Variants sit next to the original under ``variants/`` and their paths are
+kept on the model in ``<field>_variants`` together with the ``source`` file
+they were made from, so a replaced upload is detected and redone. Originals
+are left as uploaded.
+"""
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANT_SIZES = {'thumb': 128, 'medium': 512}
+DEFAULT_VARIANT_FORMAT = 'WEBP'
+DEFAULT_VARIANT_QUALITY = 80
+DEFAULT_WORKERS = 2
+VARIANT_DIR = 'variants'
+
+# (app_label, model, image field) for every image with variants
+IMAGE_FIELDS = [
+    ('visitors', 'Visitor', 'photo'),
+    ('users', 'User', 'profile_picture'),
+]
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def variant_sizes():
+    return getattr(settings, 'IMAGE_VARIANT_SIZES', DEFAULT_VARIANT_SIZES)
+
+
+def variant_name(name, variant, image_format):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, VARIANT_DIR, f'{stem}_{variant}.{image_format.lower()}')
+
+
+def _decode(storage, name, max_size):
+    with storage.open(name, 'rb') as handle, Image.open(handle) as image:
+        # JPEGs can be decoded straight at a fraction of their size
+        image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+    return image
+
+
+def render_variants(storage, name):
+    """
+    Decode ``name`` from ``storage`` once and save every variant, each one
+    downscaled from the next larger to keep resampling cheap. Returns the
+    variants dict to store on the model. Raises OSError if the file is
+    missing or not an image, and Pillow's DecompressionBombError if it is
+    too large to decode safely.
+    """
+    image_format = getattr(settings, 'IMAGE_VARIANT_FORMAT', DEFAULT_VARIANT_FORMAT)
+    quality = getattr(settings, 'IMAGE_VARIANT_QUALITY', DEFAULT_VARIANT_QUALITY)
+    sizes = sorted(variant_sizes().items(), key=lambda item: item[1], reverse=True)
+
+    image = _decode(storage, name, sizes[0][1])
+    variants = {'source': name}
+    for variant, size in sizes:
+        image = image.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        image.info = {}  # no EXIF, ICC profile or comments in the variants
+
+        buffer = BytesIO()
+        image.save(buffer, image_format, quality=quality)
+        path = variant_name(name, variant, image_format)
+        storage.delete(path)
+        variants[variant] = storage.save(path, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def needs_variants(file, variants):
+    return bool(file) and (variants or {}).get('source') != file.name
+
+
+def save_variants(model, pk, field_name, name, variants):
+    """Store ``variants`` unless the image was replaced while they were made."""
+    return model._default_manager.filter(pk=pk, **{field_name: name}).update(
+        **{variants_field(field_name): variants}
+    )
+
+
+def variant_urls(file, variants, request=None):
+    """URL of each variant of ``file``, or None for those not made yet."""
+    current = file and (variants or {}).get('source') == file.name
+    urls = {}
+    for variant in variant_sizes():
+        url = file.storage.url(variants[variant]) if current and variant in variants else None
+        urls[variant] = request.build_absolute_uri(url) if url and request is not None else url
+    return urls
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_WORKERS', DEFAULT_WORKERS), thread_name_prefix='images'
+            )
+        return _executor
+
+
+def _process(model, pk, field_name, name):
+    try:
+        storage = model._meta.get_field(field_name).storage
+        save_variants(model, pk, field_name, name, render_variants(storage, name))
+    except Exception:
+        logger.exception("Could not make variants of %s for %s %s", name, model.__name__, pk)
+
+
+def _process_in_worker(*args):
+    # Worker threads keep their own connections; treat each job like a request
+    close_old_connections()
+    try:
+        _process(*args)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(instance, field_name):
+    """
+    Make variants of ``instance.<field_name>`` in the background once the
+    current transaction commits, if the image changed since they were last
+    made. With ``IMAGE_WORKERS = 0`` they are made inline instead.
+    """
+    file = getattr(instance, field_name)
+    if not needs_variants(file, getattr(instance, variants_field(field_name))):
+        return
+
+    args = (type(instance), instance.pk, field_name, file.name)
+    if getattr(settings, 'IMAGE_WORKERS', DEFAULT_WORKERS):
+        transaction.on_commit(lambda: _get_executor().submit(_process_in_worker, *args))
+    else:
+        transaction.on_commit(lambda: _process(*args))
@@ -1,30 +1,62 @@
 from django_cron import CronJobBase, Schedule
 from .models import Lecturer, Attendance
-from datetime import date
-from django.utils.timezone import now
+from .rollup import rebuild_rollup
+from datetime import date, timedelta
+from django.utils import timezone
+
+AUTO_ABSENT_BATCH_SIZE = 500
+AUTO_ABSENT_REMARKS = 'Auto-marked as absent'
+
+
+def auto_mark_absent(start, end=None, batch_size=AUTO_ABSENT_BATCH_SIZE):
+    """
+    Create ABSENT rows for active lecturers without attendance on each day
+    from ``start`` to ``end`` inclusive. Safe to re-run and to run
+    concurrently: existing (lecturer, date) rows are skipped and the unique
+    constraint absorbs any race. Returns how many rows the days gained,
+    counted again after the insert since ``ignore_conflicts`` drops rows
+    silently.
+    """
+    end = end or start
+
+    lecturers = list(
+        Lecturer.objects.filter(is_active=True, joined_date__lte=end).values_list('id', 'joined_date')
+    )
+    in_range = Attendance.objects.filter(date__gte=start, date__lte=end)
+    existing = set(in_range.values_list('lecturer_id', 'date'))
+
+    missing = []
+    day = start
+    while day <= end:
+        for lecturer_id, joined_date in lecturers:
+            if joined_date <= day and (lecturer_id, day) not in existing:
+                missing.append(Attendance(
+                    lecturer_id=lecturer_id,
+                    date=day,
+                    status=Attendance.AttendanceStatus.ABSENT,
+                    remarks=AUTO_ABSENT_REMARKS,
+                ))
+        day += timedelta(days=1)
+
+    if not missing:
+        return 0
+
+    Attendance.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+    # bulk_create skips the rollup signals, so resync the affected days
+    rebuild_rollup(start, end)
+    return in_range.count() - len(existing)
+
 
 class DailyAttendanceAutoCreate(CronJobBase):
-    RUN_EVERY_MINS = 60 * 24  # once a day
+    RUN_AT_TIMES = ['02:00']
 
-    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    schedule = Schedule(run_at_times=RUN_AT_TIMES)
     code = 'attendance.daily_auto_attendance'
 
     def do(self):
-        today = date.today()
-        lecturers = Lecturer.objects.filter(is_active=True)
-
-        created_count = 0
-
-        for lecturer in lecturers:
-            attendance, created = Attendance.objects.get_or_create(
-                lecturer=lecturer,
-                date=today,
-                defaults={
-                    'status': Attendance.AttendanceStatus.ABSENT,
-                    'remarks': 'Auto-marked as absent',
-                }
-            )
-            if created:
-                created_count += 1
-
-        print(f"[Cron] Created {created_count} auto-attendance records for {today}")
+        # The scheduler sets scheduled_for so a caught-up run fills the day it missed
+        scheduled_for = getattr(self, 'scheduled_for', None)
+        day = timezone.localtime(scheduled_for).date() if scheduled_for else date.today()
+        created_count = auto_mark_absent(day)
+
+        return f"Created {created_count} auto-attendance records for {day}"
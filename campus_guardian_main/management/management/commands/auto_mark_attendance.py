@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from campus_guardian_main.management.cron import auto_mark_absent
+
+
+class Command(BaseCommand):
+    help = "Mark active lecturers without attendance as absent for a day or a range of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Single day to fill (YYYY-MM-DD), defaults to today")
+        parser.add_argument('--from', dest='start', help="First day of a backfill range (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='end', help="Last day of a backfill range (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        if options['date'] and (options['start'] or options['end']):
+            raise CommandError("Use either --date or --from/--to, not both")
+        if bool(options['start']) != bool(options['end']):
+            raise CommandError("--from and --to must be given together")
+
+        try:
+            if options['start']:
+                start = date.fromisoformat(options['start'])
+                end = date.fromisoformat(options['end'])
+            else:
+                start = end = date.fromisoformat(options['date']) if options['date'] else date.today()
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format")
+
+        if start > end:
+            raise CommandError("--from must be on or before --to")
+
+        created_count = auto_mark_absent(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created_count} auto-attendance records for {start} to {end}"
+        ))
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from campus_guardian_main.management.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily attendance rollup table from Attendance rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help="First date to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='end', help="Last date to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format")
+
+        if start and end and start > end:
+            raise CommandError("--from must be on or before --to")
+
+        written = rebuild_rollup(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} attendance rollup rows"))
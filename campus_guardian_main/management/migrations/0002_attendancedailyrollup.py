@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:01
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rollup(apps, schema_editor):
+    Attendance = apps.get_model('management', 'Attendance')
+    AttendanceDailyRollup = apps.get_model('management', 'AttendanceDailyRollup')
+
+    rows = (
+        Attendance.objects
+        .values('date', 'lecturer__department_name', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    AttendanceDailyRollup.objects.bulk_create(
+        [
+            AttendanceDailyRollup(
+                date=row['date'],
+                department_name=row['lecturer__department_name'],
+                status=row['status'],
+                count=row['total'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('department_name', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('PR', 'Present'), ('AB', 'Absent'), ('LT', 'Late'), ('EX', 'Excused')], max_length=2)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='attendancedailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'department_name', 'status'), name='unique_attendance_rollup_bucket'),
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    """Keep the earliest row for each (lecturer, date) before adding the constraint."""
+    Attendance = apps.get_model('management', 'Attendance')
+    AttendanceDailyRollup = apps.get_model('management', 'AttendanceDailyRollup')
+
+    duplicates = (
+        Attendance.objects
+        .values('lecturer_id', 'date')
+        .annotate(keep_id=Min('id'), rows=Count('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    removed = 0
+    for row in duplicates:
+        removed += Attendance.objects.filter(
+            lecturer_id=row['lecturer_id'], date=row['date']
+        ).exclude(id=row['keep_id']).delete()[0]
+
+    if not removed:
+        return
+
+    # The deletes above bypass the rollup signals, so recompute it
+    AttendanceDailyRollup.objects.all().delete()
+    rows = (
+        Attendance.objects
+        .values('date', 'lecturer__department_name', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    AttendanceDailyRollup.objects.bulk_create(
+        [
+            AttendanceDailyRollup(
+                date=row['date'],
+                department_name=row['lecturer__department_name'],
+                status=row['status'],
+                count=row['total'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0002_attendancedailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('lecturer', 'date'), name='unique_attendance_per_lecturer_day'),
+        ),
+    ]
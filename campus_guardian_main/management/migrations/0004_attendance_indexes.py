@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:04
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0003_attendance_unique_lecturer_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lecturer',
+            name='department_name',
+            field=models.CharField(db_index=True, max_length=100, validators=[django.core.validators.MinLengthValidator(2)]),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+        ),
+    ]
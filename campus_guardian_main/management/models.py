@@ -14,7 +14,7 @@ class Lecturer(models.Model):
 
     display_name = models.CharField(max_length=100, validators=[MinLengthValidator(3)])
     type = models.CharField(max_length=2, choices=LecturerType.choices, default=LecturerType.FULL_TIME)
-    department_name = models.CharField(max_length=100, validators=[MinLengthValidator(2)])
+    department_name = models.CharField(max_length=100, validators=[MinLengthValidator(2)], db_index=True)
     is_active = models.BooleanField(default=True)
     staff_id = models.CharField(max_length=10, unique=True, editable=False)
     specialization = models.CharField(max_length=100, blank=True)
@@ -48,10 +48,43 @@ class Attendance(models.Model):
     remarks = models.TextField(blank=True)
     recorded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lecturer', 'date'], name='unique_attendance_per_lecturer_day'),
+        ]
+        # The unique constraint above doubles as the (lecturer, date) index
+        indexes = [
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.lecturer.display_name} - {self.date} - {self.get_status_display()}"
 
 
+class AttendanceDailyRollup(models.Model):
+    """
+    Pre-aggregated attendance counts, one row per (date, department, status).
+
+    Kept current by the Attendance signal handlers in signals.py and rebuilt
+    with the ``rebuild_attendance_rollup`` management command.
+    """
+    date = models.DateField()
+    department_name = models.CharField(max_length=100)
+    status = models.CharField(max_length=2, choices=Attendance.AttendanceStatus.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'department_name', 'status'],
+                name='unique_attendance_rollup_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.department_name} - {self.status}: {self.count}"
+
+
 # class WebAuthnCredential(models.Model):
 #     lecturer = models.ForeignKey(Lecturer, on_delete=models.CASCADE, related_name='credentials')
 #     credential_id = models.CharField(max_length=255, unique=True)
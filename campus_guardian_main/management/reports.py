@@ -0,0 +1,168 @@
+from calendar import monthrange
+from datetime import date, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Attendance, AttendanceDailyRollup
+
+MAX_PERIOD_DAYS = 366
+
+
+def parse_date_range(params):
+    """
+    Resolve the reporting window from query params.
+
+    Accepts either ``from``/``to`` (ISO dates, inclusive, at most
+    ``MAX_PERIOD_DAYS`` days) or ``year``/``month``. Returns a ``(start, end)`` tuple and raises ValueError with a client-facing
+    message when the params are missing or invalid.
+    """
+    start = params.get('from')
+    end = params.get('to')
+
+    if start or end:
+        if not start or not end:
+            raise ValueError("Both from and to are required")
+        try:
+            start = date.fromisoformat(start)
+            end = date.fromisoformat(end)
+        except ValueError:
+            raise ValueError("Invalid from or to date, expected YYYY-MM-DD")
+        if start > end:
+            raise ValueError("from must be on or before to")
+        if (end - start).days >= MAX_PERIOD_DAYS:
+            raise ValueError(f"from and to must be at most {MAX_PERIOD_DAYS} days apart")
+        return start, end
+
+    year = params.get('year')
+    month = params.get('month')
+    if not year or not month:
+        raise ValueError("Year and month are required")
+
+    try:
+        year = int(year)
+        month = int(month)
+        num_days = monthrange(year, month)[1]
+        return date(year, month, 1), date(year, month, num_days)
+    except ValueError:
+        raise ValueError("Invalid year or month")
+
+
+def calendar_range(year, month=None, day=None):
+    """
+    Half-open ``[start, end)`` date range for a year, a month or a single day.
+
+    Raises ValueError for dates that don't exist.
+    """
+    if month is None:
+        return date(year, 1, 1), date(year + 1, 1, 1)
+
+    if day is None:
+        start = date(year, month, 1)
+        return start, start + timedelta(days=monthrange(year, month)[1])
+
+    start = date(year, month, day)
+    return start, start + timedelta(days=1)
+
+
+def _percentage(count, total):
+    return round((count / total) * 100, 1)
+
+
+def _daily_counts(start, end, lecturer_id=None, department=None):
+    """
+    Return ``{date: {present, late, absent, total}}`` for the window.
+
+    Department and whole-campus reports read the pre-aggregated rollup table;
+    per-lecturer reports fall back to one grouped query over Attendance.
+    """
+    status = Attendance.AttendanceStatus
+
+    if lecturer_id:
+        queryset = Attendance.objects.filter(date__gte=start, date__lte=end, lecturer_id=lecturer_id)
+        if department:
+            queryset = queryset.filter(lecturer__department_name__iexact=department)
+        rows = queryset.values('date').annotate(
+            present=Count('id', filter=Q(status=status.PRESENT)),
+            late=Count('id', filter=Q(status=status.LATE)),
+            absent=Count('id', filter=Q(status=status.ABSENT)),
+            total=Count('id'),
+        )
+    else:
+        queryset = AttendanceDailyRollup.objects.filter(date__gte=start, date__lte=end)
+        if department:
+            queryset = queryset.filter(department_name__iexact=department)
+        rows = queryset.values('date').annotate(
+            present=Coalesce(Sum('count', filter=Q(status=status.PRESENT)), 0),
+            late=Coalesce(Sum('count', filter=Q(status=status.LATE)), 0),
+            absent=Coalesce(Sum('count', filter=Q(status=status.ABSENT)), 0),
+            total=Coalesce(Sum('count'), 0),
+        )
+
+    return {row['date']: row for row in rows.order_by('date')}
+
+
+def daily_attendance_summary(start, end, lecturer_id=None, department=None):
+    """
+    Per-day present/late/absent counts between ``start`` and ``end`` inclusive.
+
+    All days are computed with a single grouped query; days without any
+    attendance rows are filled in with zero counts.
+    """
+    counts_by_date = _daily_counts(start, end, lecturer_id, department)
+
+    summary_data = []
+    day = start
+    while day <= end:
+        row = counts_by_date.get(day)
+        present = row['present'] if row else 0
+        late = row['late'] if row else 0
+        absent = row['absent'] if row else 0
+        total = (row['total'] if row else 0) or 1
+
+        summary_data.append({
+            "date": day,
+            "presentCount": present,
+            "lateCount": late,
+            "absentCount": absent,
+            "presentPercentage": _percentage(present, total),
+            "latePercentage": _percentage(late, total),
+            "absentPercentage": _percentage(absent, total),
+        })
+        day += timedelta(days=1)
+
+    return summary_data
+
+
+def department_attendance_summary(start, end):
+    """Per-department status totals for the window, read from the rollup table."""
+    status = Attendance.AttendanceStatus
+    rows = (
+        AttendanceDailyRollup.objects
+        .filter(date__gte=start, date__lte=end)
+        .values('department_name')
+        .annotate(
+            present=Coalesce(Sum('count', filter=Q(status=status.PRESENT)), 0),
+            late=Coalesce(Sum('count', filter=Q(status=status.LATE)), 0),
+            absent=Coalesce(Sum('count', filter=Q(status=status.ABSENT)), 0),
+            excused=Coalesce(Sum('count', filter=Q(status=status.EXCUSED)), 0),
+            total=Coalesce(Sum('count'), 0),
+        )
+        .filter(total__gt=0)
+        .order_by('department_name')
+    )
+
+    summary_data = []
+    for row in rows:
+        total = row['total']
+        summary_data.append({
+            "department": row['department_name'],
+            "presentCount": row['present'],
+            "lateCount": row['late'],
+            "absentCount": row['absent'],
+            "excusedCount": row['excused'],
+            "presentPercentage": _percentage(row['present'], total),
+            "latePercentage": _percentage(row['late'], total),
+            "absentPercentage": _percentage(row['absent'], total),
+        })
+    return summary_data
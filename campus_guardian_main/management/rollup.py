@@ -0,0 +1,82 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Attendance, AttendanceDailyRollup
+
+
+def bump_rollup(day, department_name, status, delta):
+    """Add ``delta`` to the rollup bucket for (day, department_name, status)."""
+    if not delta:
+        return
+
+    buckets = AttendanceDailyRollup.objects.filter(
+        date=day, department_name=department_name, status=status
+    )
+    if buckets.update(count=F('count') + delta):
+        return
+
+    try:
+        with transaction.atomic():
+            AttendanceDailyRollup.objects.create(
+                date=day, department_name=department_name, status=status, count=delta
+            )
+    except IntegrityError:
+        # Another writer created the bucket between our UPDATE and INSERT
+        buckets.update(count=F('count') + delta)
+
+
+def move_lecturer_rollup(lecturer_id, old_department, new_department):
+    """Re-bucket a lecturer's attendance after their department changes."""
+    rows = (
+        Attendance.objects.filter(lecturer_id=lecturer_id)
+        .values('date', 'status')
+        .annotate(total=Count('id'))
+    )
+    with transaction.atomic():
+        for row in rows:
+            bump_rollup(row['date'], old_department, row['status'], -row['total'])
+            bump_rollup(row['date'], new_department, row['status'], row['total'])
+
+
+def rebuild_rollup(start=None, end=None):
+    """
+    Recompute rollup rows from Attendance, optionally limited to a date window.
+
+    The window's buckets are locked before Attendance is counted, so a
+    concurrent signal bump either lands before the count (and is included)
+    or waits and applies on top of the rebuilt rows. Returns the number of
+    rollup rows written.
+    """
+    attendance = Attendance.objects.all()
+    stale = AttendanceDailyRollup.objects.all()
+    if start:
+        attendance = attendance.filter(date__gte=start)
+        stale = stale.filter(date__gte=start)
+    if end:
+        attendance = attendance.filter(date__lte=end)
+        stale = stale.filter(date__lte=end)
+
+    with transaction.atomic():
+        # On MySQL the range lock also holds back buckets created meanwhile
+        list(stale.select_for_update().order_by('pk').values_list('pk', flat=True))
+
+        rows = (
+            attendance
+            .values('date', 'lecturer__department_name', 'status')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        buckets = [
+            AttendanceDailyRollup(
+                date=row['date'],
+                department_name=row['lecturer__department_name'],
+                status=row['status'],
+                count=row['total'],
+            )
+            for row in rows.iterator()
+        ]
+
+        stale.delete()
+        AttendanceDailyRollup.objects.bulk_create(buckets, batch_size=1000)
+
+    return len(buckets)
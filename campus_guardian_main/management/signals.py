@@ -0,0 +1,55 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Attendance, Lecturer
+from .rollup import bump_rollup, move_lecturer_rollup
+
+
+@receiver(pre_save, sender=Attendance)
+def remember_previous_attendance(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous = None
+    if raw or not instance.pk:
+        return
+    instance._rollup_previous = (
+        Attendance.objects.filter(pk=instance.pk)
+        .values_list('date', 'lecturer__department_name', 'status')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Attendance)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    current = (instance.date, instance.lecturer.department_name, instance.status)
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous == current:
+        return
+
+    if previous:
+        bump_rollup(*previous, -1)
+    bump_rollup(*current, 1)
+
+
+@receiver(post_delete, sender=Attendance)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    bump_rollup(instance.date, instance.lecturer.department_name, instance.status, -1)
+
+
+@receiver(pre_save, sender=Lecturer)
+def remember_previous_department(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous_department = None
+    if raw or not instance.pk:
+        return
+    instance._rollup_previous_department = (
+        Lecturer.objects.filter(pk=instance.pk).values_list('department_name', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Lecturer)
+def update_rollup_on_department_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_rollup_previous_department', None)
+    if raw or created or previous is None or previous == instance.department_name:
+        return
+    move_lecturer_rollup(instance.pk, previous, instance.department_name)
@@ -1,3 +1,149 @@
+import json
+import re
+from datetime import date, timedelta
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .cron import auto_mark_absent
+from .models import Lecturer, Attendance, AttendanceDailyRollup
+from .views import AttendanceViewSet
+
+
+@skipUnless(connection.vendor in ('mysql', 'sqlite'), "EXPLAIN parsing is only implemented for MySQL and SQLite")
+class AttendanceQueryPlanTests(TestCase):
+    """The attendance list filters must be answerable from an index, not a table scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        departments = ['Physics', 'Maths', 'Chemistry', 'Biology']
+        lecturers = [
+            Lecturer.objects.create(
+                display_name=f"Lecturer {i}",
+                department_name=departments[i % len(departments)],
+                joined_date=date(2020, 1, 1),
+                email=f"lecturer{i}@example.com",
+            )
+            for i in range(8)
+        ]
+        start = date(2024, 1, 1)
+        Attendance.objects.bulk_create([
+            Attendance(lecturer=lecturer, date=start + timedelta(days=offset))
+            for offset in range(366)
+            for lecturer in lecturers
+        ])
+        cls.lecturer = lecturers[0]
+
+    def get_queryset(self, **params):
+        view = AttendanceViewSet()
+        view.request = Request(APIRequestFactory().get('/api/attendance/', params))
+        return view.get_queryset()
+
+    def assertNoFullScan(self, queryset):
+        table = Attendance._meta.db_table
+        if connection.vendor == 'mysql':
+            plan = json.loads(queryset.explain(format='json'))
+            scanned = [
+                node for node in _mysql_table_nodes(plan)
+                if node.get('table_name') == table and node.get('access_type') == 'ALL'
+            ]
+            self.assertFalse(scanned, f"Full scan of {table}:\n{json.dumps(plan, indent=2)}")
+        else:
+            plan = queryset.explain()
+            self.assertIsNone(
+                re.search(rf'\bSCAN {table}\b(?! USING (COVERING )?INDEX)', plan),
+                f"Full scan of {table}:\n{plan}",
+            )
+
+    def test_year_filter_uses_date_range(self):
+        queryset = self.get_queryset(year=2024)
+        self.assertNotIn('strftime', str(queryset.query).lower())
+        self.assertNotIn('extract', str(queryset.query).lower())
+        self.assertNoFullScan(queryset)
+
+    def test_month_filter_uses_index(self):
+        queryset = self.get_queryset(year=2024, month=2)
+        self.assertEqual(queryset.count(), 29 * 8)
+        self.assertNoFullScan(queryset)
+
+    def test_day_filter_uses_index(self):
+        queryset = self.get_queryset(year=2024, month=2, day=29)
+        self.assertEqual(queryset.count(), 8)
+        self.assertNoFullScan(queryset)
+
+    def test_lecturer_filter_uses_index(self):
+        queryset = self.get_queryset(year=2024, month=3, lecturer_id=self.lecturer.id)
+        self.assertEqual(queryset.count(), 31)
+        self.assertNoFullScan(queryset)
+
+    def test_department_filter_uses_index(self):
+        queryset = self.get_queryset(department='Physics')
+        self.assertEqual(queryset.count(), 366 * 2)
+        self.assertNoFullScan(queryset)
+
+    def test_invalid_date_returns_nothing(self):
+        self.assertEqual(self.get_queryset(year=2023, month=2, day=30).count(), 0)
+
+
+class AttendanceCheckInTests(TestCase):
+    def setUp(self):
+        self.lecturer = Lecturer.objects.create(
+            display_name="Lecturer", department_name="Physics", joined_date=date(2020, 1, 1),
+            email="lecturer@example.com",
+        )
+        self.day = date(2024, 3, 1)
+
+    def check_in(self, status='PR'):
+        return APIClient().post(
+            '/api/attendance/',
+            {'lecturer_id': self.lecturer.id, 'date': self.day.isoformat(), 'status': status},
+            format='json',
+        )
+
+    def test_check_in_updates_auto_marked_absence(self):
+        lecturer, day = self.lecturer, self.day
+        self.assertEqual(auto_mark_absent(day), 1)
+        self.assertEqual(auto_mark_absent(day), 0)
+
+        response = self.check_in()
+
+        self.assertEqual(response.status_code, 200, response.content)
+        attendance = Attendance.objects.get(lecturer=lecturer, date=day)
+        self.assertEqual(attendance.status, Attendance.AttendanceStatus.PRESENT)
+        self.assertEqual(attendance.remarks, '')
+        self.assertEqual(response.json()['id'], attendance.id)
+        self.assertEqual(
+            dict(AttendanceDailyRollup.objects.filter(date=day).values_list('status', 'count')),
+            {'AB': 0, 'PR': 1},
+        )
+
+    def test_second_check_in_is_rejected(self):
+        self.assertEqual(self.check_in().status_code, 201)
+
+        self.assertEqual(self.check_in('AB').status_code, 400)
+        self.assertEqual(Attendance.objects.get().status, Attendance.AttendanceStatus.PRESENT)
+
+
+class AttendanceSummaryTests(TestCase):
+    def test_summary_span_is_capped(self):
+        client = APIClient()
+
+        response = client.get('/api/attendance/daily-summary/', {'from': '2024-01-01', 'to': '2024-12-31'})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        response = client.get('/api/attendance/daily-summary/', {'from': '1900-01-01', 'to': '2099-12-31'})
+        self.assertEqual(response.status_code, 400)
+
 
-# Create your tests here.
+def _mysql_table_nodes(node):
+    if isinstance(node, dict):
+        if 'table' in node:
+            yield node['table']
+        for value in node.values():
+            yield from _mysql_table_nodes(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _mysql_table_nodes(item)
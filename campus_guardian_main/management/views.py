@@ -1,13 +1,23 @@
-from rest_framework import viewsets, permissions
+from datetime import date
+
+from django.db import transaction
+from rest_framework import viewsets, permissions, serializers, status
 
 from rest_framework.decorators import action
 from .models import Lecturer, Attendance
 from rest_framework.response import Response
-from calendar import monthrange
-from datetime import datetime, date
+from .cron import AUTO_ABSENT_REMARKS
+from .reports import calendar_range, parse_date_range, daily_attendance_summary, department_attendance_summary
 from .serializers import LecturerSerializer, AttendanceSerializer
 
 
+def _parse_int(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
 class LecturerViewSet(viewsets.ModelViewSet):
     queryset = Lecturer.objects.all()
     permission_classes = [permissions.AllowAny]
@@ -34,27 +44,27 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 
         queryset = Attendance.objects.select_related('lecturer')
 
-        # Apply filtering by year, month, and day if provided
+        # Apply filtering by year, month, and day if provided. Invalid values
+        # are ignored and we just return all records for that part.
+        year = _parse_int(year)
+        month = _parse_int(month)
+        day = _parse_int(day)
+
         if year:
+            # Half-open date range so the lookup can use the date index
             try:
-                year = int(year)
-                queryset = queryset.filter(date__year=year)
+                start, end = calendar_range(year, month, day if month else None)
+                queryset = queryset.filter(date__gte=start, date__lt=end)
             except ValueError:
-                pass  # If the year is invalid, we just return all records
-
-        if month:
-            try:
-                month = int(month)
+                return queryset.none()
+            if day and not month:
+                queryset = queryset.filter(date__day=day)
+        else:
+            # Without a year there is no contiguous range to search
+            if month:
                 queryset = queryset.filter(date__month=month)
-            except ValueError:
-                pass  # If the month is invalid, we just return all records
-
-        if day:
-            try:
-                day = int(day)
+            if day:
                 queryset = queryset.filter(date__day=day)
-            except ValueError:
-                pass  # If the day is invalid, we just return all records
 
         # Apply filtering by lecturer ID if provided
         if lecturer_id:
@@ -66,55 +76,69 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 
         # Apply filtering by department if provided
         if department:
-            queryset = queryset.filter(lecturer__department__icontains=department)
+            queryset = queryset.filter(lecturer__department_name=department)
 
         return queryset
 
+    def create(self, request, *args, **kwargs):
+        # The nightly roll-call pre-fills ABSENT rows, so a check-in for a
+        # lecturer and day replaces the auto-marked row. Any other duplicate
+        # is still rejected by the serializer.
+        with transaction.atomic():
+            absence = self._auto_marked_absence(request.data)
+            if absence is None:
+                return super().create(request, *args, **kwargs)
+
+            serializer = self.get_serializer(absence, data=request.data)
+            serializer.is_valid(raise_exception=True)
+            # The roll-call's remark doesn't describe the check-in
+            serializer.save(remarks=serializer.validated_data.get('remarks', ''))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _auto_marked_absence(data):
+        lecturer_id = _parse_int(data.get('lecturer_id'))
+        try:
+            day = serializers.DateField().to_internal_value(data['date']) if data.get('date') else date.today()
+        except serializers.ValidationError:
+            return None  # left for the serializer to report
+        if lecturer_id is None:
+            return None
+        return Attendance.objects.select_for_update().filter(
+            lecturer_id=lecturer_id,
+            date=day,
+            status=Attendance.AttendanceStatus.ABSENT,
+            remarks=AUTO_ABSENT_REMARKS,
+        ).first()
+
     @action(detail=False, methods=['get'], url_path='daily-summary')
     def daily_summary(self, request):
-        year = request.query_params.get('year')
-        month = request.query_params.get('month')
         lecturer = request.query_params.get('lecturer')
         department = request.query_params.get('department')
 
-        if not year or not month:
-            return Response({"error": "Year and month are required"}, status=400)
-
         try:
-            year = int(year)
-            month = int(month)
-        except ValueError:
-            return Response({"error": "Invalid year or month"}, status=400)
-
-        # Get number of days in the month
-        num_days = monthrange(year, month)[1]
-        summary_data = []
+            start, end = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
-        for day in range(1, num_days + 1):
-            day_date = date(year, month, day)
-            queryset = Attendance.objects.filter(date=day_date)
+        if lecturer:
+            try:
+                lecturer = int(lecturer)
+            except ValueError:
+                return Response({"error": "Invalid lecturer"}, status=400)
 
-            if lecturer:
-                queryset = queryset.filter(lecturer_id=lecturer)
-            if department:
-                queryset = queryset.filter(lecturer__department__iexact=department)
+        summary_data = daily_attendance_summary(start, end, lecturer_id=lecturer, department=department)
 
-            present = queryset.filter(status='pr').count()
-            late = queryset.filter(status='late').count()
-            absent = queryset.filter(status='ab').count()
-            total = queryset.count() or 1
+        return Response(summary_data)
 
-            summary_data.append({
-                "date": day_date,
-                "presentCount": present,
-                "lateCount": late,
-                "absentCount": absent,
-                "presentPercentage": round((present / total) * 100, 1),
-                "latePercentage": round((late / total) * 100, 1),
-                "absentPercentage": round((absent / total) * 100, 1),
-            })
+    @action(detail=False, methods=['get'], url_path='department-summary')
+    def department_summary(self, request):
+        try:
+            start, end = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
-        return Response(summary_data)
+        return Response(department_attendance_summary(start, end))
 
 # views.py
 # import json
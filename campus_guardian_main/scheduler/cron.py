@@ -0,0 +1,13 @@
+from django_cron import CronJobBase, Schedule
+
+from .runner import prune_job_runs
+
+
+class JobRunPrune(CronJobBase):
+    RUN_AT_TIMES = ['04:00']
+
+    schedule = Schedule(run_at_times=RUN_AT_TIMES)
+    code = 'scheduler.job_run_prune'
+
+    def do(self):
+        return f"Pruned {prune_job_runs()} scheduler run records"
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from campus_guardian_main.scheduler.runner import Scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the CRON_CLASSES jobs on their schedules. Start this as its own "
+        "process; several instances can run at once and each slot runs only once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run due jobs once and exit")
+        parser.add_argument('--poll', type=int, help="Seconds between checks for due jobs")
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler()
+
+        if options['once']:
+            for run in scheduler.tick():
+                self.report(run)
+            return
+
+        self.stdout.write(f"Scheduler {scheduler.owner} started")
+        try:
+            scheduler.run_forever(poll_seconds=options['poll'], on_run=self.report, on_error=self.report_error)
+        except KeyboardInterrupt:
+            self.stdout.write("Scheduler stopped")
+
+    def report(self, run):
+        line = f"{run.job_code} @ {run.scheduled_for:%Y-%m-%d %H:%M} took {run.duration}"
+        if run.is_success:
+            self.stdout.write(self.style.SUCCESS(f"{line}: {run.message or 'ok'}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"{line}: failed\n{run.message}"))
+
+    def report_error(self, error):
+        self.stderr.write(self.style.ERROR(f"Scheduler tick failed, retrying on the next poll\n{error}"))
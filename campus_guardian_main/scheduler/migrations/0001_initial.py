@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_code', models.CharField(max_length=100, unique=True)),
+                ('owner', models.CharField(blank=True, max_length=255)),
+                ('locked_until', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_code', models.CharField(max_length=100)),
+                ('scheduled_for', models.DateTimeField(help_text='Schedule slot this run covers')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('is_success', models.BooleanField(default=False)),
+                ('message', models.TextField(blank=True)),
+                ('owner', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'ordering': ['-scheduled_for'],
+                'indexes': [models.Index(fields=['job_code', 'scheduled_for'], name='scheduler_j_job_cod_870141_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import models
+
+
+class JobLock(models.Model):
+    """Lease held by the scheduler process currently allowed to run a job."""
+    job_code = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=255, blank=True)
+    locked_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.job_code} held by {self.owner or 'nobody'} until {self.locked_until}"
+
+
+class JobRun(models.Model):
+    """One execution of a scheduled job, kept as run history."""
+    job_code = models.CharField(max_length=100)
+    scheduled_for = models.DateTimeField(help_text="Schedule slot this run covers")
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.DurationField(null=True, blank=True)
+    is_success = models.BooleanField(default=False)
+    message = models.TextField(blank=True)
+    owner = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ['-scheduled_for']
+        indexes = [
+            models.Index(fields=['job_code', 'scheduled_for']),
+        ]
+
+    def __str__(self):
+        state = "ok" if self.is_success else "failed"
+        return f"{self.job_code} @ {self.scheduled_for} ({state})"
@@ -0,0 +1,261 @@
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import JobLock, JobRun
+
+DEFAULT_LEASE_SECONDS = 15 * 60
+DEFAULT_MAX_CATCH_UP = 7
+DEFAULT_POLL_SECONDS = 30
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RUN_RETENTION_DAYS = 30
+
+
+def make_owner_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(job_code, owner, lease_seconds):
+    """
+    Take or renew the lease on ``job_code``. Only one owner can hold an
+    unexpired lease, so only one process runs the job at a time.
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=lease_seconds)
+
+    updated = JobLock.objects.filter(job_code=job_code).filter(
+        Q(locked_until__lte=now) | Q(owner=owner)
+    ).update(owner=owner, locked_until=locked_until)
+    if updated:
+        return True
+
+    try:
+        with transaction.atomic():
+            JobLock.objects.create(job_code=job_code, owner=owner, locked_until=locked_until)
+        return True
+    except IntegrityError:
+        return False
+
+
+def release_lease(job_code, owner):
+    JobLock.objects.filter(job_code=job_code, owner=owner).update(owner='', locked_until=timezone.now())
+
+
+class LeaseHeartbeat:
+    """
+    Keeps renewing a job lease from a background thread while the job runs,
+    so a run longer than the lease isn't started again by another process.
+    """
+
+    def __init__(self, job_code, owner, lease_seconds):
+        self.job_code = job_code
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'lease-{job_code}', daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.lease_seconds / 3):
+                try:
+                    acquire_lease(self.job_code, self.owner, self.lease_seconds)
+                except Exception:
+                    close_old_connections()  # retry on the next beat with a fresh connection
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def _daily_slots(schedule, start_day, now):
+    times = [datetime.strptime(value, '%H:%M').time() for value in schedule.run_at_times]
+    run_on_days = schedule.run_on_days
+    slots = []
+    day = start_day
+    while day <= now.date():
+        if run_on_days is None or day.weekday() in run_on_days:
+            for at in times:
+                slot = timezone.make_aware(datetime.combine(day, at))
+                if slot <= now:
+                    slots.append(slot)
+        day += timedelta(days=1)
+    return slots
+
+
+def due_slots(schedule, last_slot, now, max_catch_up=DEFAULT_MAX_CATCH_UP):
+    """
+    Schedule slots that are due but have not run yet, oldest first.
+
+    With no history only the most recent slot is returned. After downtime at
+    most ``max_catch_up`` of the newest missed slots are returned.
+    """
+    if schedule.run_at_times:
+        now = timezone.localtime(now)
+        if last_slot is None:
+            start_day = now.date() - timedelta(days=1)
+        else:
+            start_day = max(
+                timezone.localtime(last_slot).date(),
+                now.date() - timedelta(days=max_catch_up),
+            )
+        slots = _daily_slots(schedule, start_day, now)
+        if last_slot is None:
+            return slots[-1:]
+        return [slot for slot in slots if slot > last_slot][-max_catch_up:]
+
+    if not schedule.run_every_mins:
+        return []
+
+    if last_slot is None:
+        return [now]
+
+    interval = timedelta(minutes=schedule.run_every_mins)
+    missed = int((now - last_slot) / interval)
+    first = max(1, missed - max_catch_up + 1)
+    return [last_slot + interval * step for step in range(first, missed + 1)]
+
+
+def last_completed_slot(job_code, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Newest slot that needs no more runs: one run of it succeeded, or all of
+    its ``max_attempts`` runs failed. Slots after it are still due.
+    """
+    return (
+        JobRun.objects.filter(job_code=job_code, finished_at__isnull=False)
+        .values('scheduled_for')
+        .annotate(successes=Count('pk', filter=Q(is_success=True)), attempts=Count('pk'))
+        .filter(Q(successes__gt=0) | Q(attempts__gte=max_attempts))
+        .order_by('-scheduled_for')
+        .values_list('scheduled_for', flat=True)
+        .first()
+    )
+
+
+def prune_job_runs(now=None):
+    """
+    Delete JobRuns that started more than ``SCHEDULER_RUN_RETENTION_DAYS``
+    ago. Each job's last completed slot and anything after it are kept, so
+    pruning never makes a slot due again. Returns the number of rows deleted.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=getattr(settings, 'SCHEDULER_RUN_RETENTION_DAYS', DEFAULT_RUN_RETENTION_DAYS))
+    max_attempts = getattr(settings, 'SCHEDULER_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+    deleted = 0
+    for job_code in JobRun.objects.order_by().values_list('job_code', flat=True).distinct():
+        last_slot = last_completed_slot(job_code, max_attempts)
+        if last_slot is None:
+            continue
+        count, _ = JobRun.objects.filter(
+            job_code=job_code, started_at__lt=cutoff, scheduled_for__lt=last_slot
+        ).delete()
+        deleted += count
+    return deleted
+
+
+class Scheduler:
+    """
+    Runs the jobs listed in ``settings.CRON_CLASSES`` from a dedicated process.
+
+    Each job is guarded by a ``JobLock`` lease so several scheduler processes
+    can run side by side without executing a slot twice, and every execution
+    is recorded as a ``JobRun``.
+    """
+
+    def __init__(self, job_classes=None, owner=None, lease_seconds=None, max_catch_up=None, max_attempts=None):
+        if job_classes is None:
+            job_classes = [import_string(path) for path in getattr(settings, 'CRON_CLASSES', [])]
+        self.job_classes = job_classes
+        self.owner = owner or make_owner_id()
+        self.lease_seconds = lease_seconds or getattr(settings, 'SCHEDULER_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+        self.max_catch_up = max_catch_up or getattr(settings, 'SCHEDULER_MAX_CATCH_UP', DEFAULT_MAX_CATCH_UP)
+        self.max_attempts = max_attempts or getattr(settings, 'SCHEDULER_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+    def tick(self, now=None):
+        """Run every due slot of every job this process can lease. Returns the JobRuns."""
+        runs = []
+        for job_class in self.job_classes:
+            runs.extend(self.run_job(job_class, now))
+        return runs
+
+    def run_job(self, job_class, now=None):
+        job_code = job_class.code
+        if not acquire_lease(job_code, self.owner, self.lease_seconds):
+            return []
+
+        runs = []
+        try:
+            slots = due_slots(
+                job_class.schedule,
+                last_completed_slot(job_code, self.max_attempts),
+                now or timezone.now(),
+                self.max_catch_up,
+            )
+            for slot in slots:
+                # Renew before each slot so a long catch-up keeps the lease
+                if not acquire_lease(job_code, self.owner, self.lease_seconds):
+                    break
+                run = self._execute(job_class, slot)
+                runs.append(run)
+                if not run.is_success:
+                    break  # retried on the next poll, before any later slot
+        finally:
+            release_lease(job_code, self.owner)
+        return runs
+
+    def _execute(self, job_class, slot):
+        run = JobRun.objects.create(
+            job_code=job_class.code,
+            scheduled_for=slot,
+            started_at=timezone.now(),
+            owner=self.owner,
+        )
+        try:
+            job = job_class()
+            job.scheduled_for = slot
+            with LeaseHeartbeat(job_class.code, self.owner, self.lease_seconds):
+                message = job.do()
+            run.is_success = True
+            run.message = str(message) if message else ''
+        except Exception:
+            run.message = traceback.format_exc()
+
+        run.finished_at = timezone.now()
+        run.duration = run.finished_at - run.started_at
+        run.save(update_fields=['is_success', 'message', 'finished_at', 'duration'])
+        return run
+
+    def run_forever(self, poll_seconds=None, on_run=None, on_error=None):
+        """
+        Tick every ``poll_seconds`` until interrupted. Errors outside the jobs
+        themselves, such as the database restarting or failing over, are
+        passed to ``on_error`` and retried on the next poll with a fresh
+        connection.
+        """
+        poll_seconds = poll_seconds or getattr(settings, 'SCHEDULER_POLL_SECONDS', DEFAULT_POLL_SECONDS)
+        while True:
+            try:
+                for run in self.tick():
+                    if on_run:
+                        on_run(run)
+            except Exception:
+                close_old_connections()
+                if on_error:
+                    on_error(traceback.format_exc())
+            time.sleep(poll_seconds)
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from django_cron import CronJobBase, Schedule
+
+from .models import JobLock, JobRun
+from .runner import Scheduler, acquire_lease, due_slots, prune_job_runs, release_lease
+
+
+class IntervalJob(CronJobBase):
+    schedule = Schedule(run_every_mins=5)
+    code = 'tests.interval'
+
+    def do(self):
+        return "ok"
+
+
+class FailingJob(CronJobBase):
+    schedule = Schedule(run_every_mins=5)
+    code = 'tests.failing'
+
+    def do(self):
+        raise RuntimeError("boom")
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime(2024, 3, day, hour, minute))
+
+
+class LeaseTests(TestCase):
+    def test_only_one_owner_holds_a_lease(self):
+        self.assertTrue(acquire_lease('job', 'a', 60))
+        self.assertFalse(acquire_lease('job', 'b', 60))
+        self.assertTrue(acquire_lease('job', 'a', 60))
+
+        release_lease('job', 'a')
+        self.assertTrue(acquire_lease('job', 'b', 60))
+
+    def test_expired_lease_is_taken_over(self):
+        JobLock.objects.create(job_code='job', owner='dead', locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertTrue(acquire_lease('job', 'b', 60))
+        self.assertEqual(JobLock.objects.get().owner, 'b')
+
+    def test_second_scheduler_skips_a_leased_job(self):
+        first = Scheduler([IntervalJob], owner='first', lease_seconds=60)
+        second = Scheduler([IntervalJob], owner='second', lease_seconds=60)
+        acquire_lease(IntervalJob.code, first.owner, first.lease_seconds)
+
+        self.assertEqual(second.tick(), [])
+        self.assertEqual(len(first.tick()), 1)
+
+
+class DueSlotTests(TestCase):
+    def test_interval_job_catches_up_the_newest_missed_slots(self):
+        now = at(4, 10)
+
+        self.assertEqual(due_slots(IntervalJob.schedule, None, now), [now])
+        self.assertEqual(
+            due_slots(IntervalJob.schedule, now - timedelta(hours=1), now, max_catch_up=3),
+            [now - timedelta(minutes=10), now - timedelta(minutes=5), now],
+        )
+
+    def test_daily_job_catches_up_missed_days(self):
+        schedule = Schedule(run_at_times=['02:00'])
+        now = at(10, 10)
+
+        self.assertEqual(due_slots(schedule, None, now), [at(10, 2)])
+        self.assertEqual(due_slots(schedule, at(7, 2), now), [at(8, 2), at(9, 2), at(10, 2)])
+        self.assertEqual(due_slots(schedule, at(1, 2), now, max_catch_up=2), [at(9, 2), at(10, 2)])
+
+    def test_scheduler_runs_at_most_max_catch_up_slots(self):
+        now = at(4, 10)
+        JobRun.objects.create(
+            job_code=IntervalJob.code, scheduled_for=now - timedelta(days=1),
+            started_at=now - timedelta(days=1), finished_at=now - timedelta(days=1), is_success=True,
+        )
+
+        runs = Scheduler([IntervalJob], owner='a', max_catch_up=3).tick(now)
+
+        self.assertEqual([run.scheduled_for for run in runs], [now - timedelta(minutes=10), now - timedelta(minutes=5), now])
+        self.assertTrue(all(run.is_success for run in runs))
+
+
+class FailedRunTests(TestCase):
+    def test_failed_slot_is_retried_until_max_attempts(self):
+        now = at(4, 10)
+        scheduler = Scheduler([FailingJob], owner='a', max_attempts=2)
+
+        first, = scheduler.tick(now)
+        self.assertFalse(first.is_success)
+        retry, = scheduler.tick(now)
+        self.assertEqual(retry.scheduled_for, first.scheduled_for)
+
+        self.assertEqual(scheduler.tick(now), [])
+
+    def test_prune_keeps_the_last_completed_slot(self):
+        now = timezone.now()
+        old = [now - timedelta(days=60 - day) for day in range(3)]
+        for slot in old:
+            JobRun.objects.create(
+                job_code=IntervalJob.code, scheduled_for=slot, started_at=slot, finished_at=slot, is_success=True,
+            )
+
+        self.assertEqual(prune_job_runs(now), 2)
+        self.assertEqual(list(JobRun.objects.values_list('scheduled_for', flat=True)), [old[-1]])
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from campus_guardian_main.images import IMAGE_FIELDS, render_variants, save_variants, variants_field
+
+DEFAULT_WORKERS = 4
+
+
+class Command(BaseCommand):
+    help = "Make thumbnail and medium variants of existing visitor photos and profile pictures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help=f"Images processed in parallel (default {DEFAULT_WORKERS})")
+        parser.add_argument('--force', action='store_true', help="Remake variants that are already up to date")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        # Pillow releases the GIL while decoding, resizing and encoding, so threads scale
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for app_label, model_name, field_name in IMAGE_FIELDS:
+                self.backfill(executor, apps.get_model(app_label, model_name), field_name, options['force'])
+
+    def backfill(self, executor, model, field_name, force):
+        storage = model._meta.get_field(field_name).storage
+        rows = (
+            model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            .order_by('pk').values_list('pk', field_name, variants_field(field_name))
+        )
+        pending = [(pk, name) for pk, name, variants in rows if force or (variants or {}).get('source') != name]
+
+        def render(row):
+            pk, name = row
+            try:
+                return pk, name, render_variants(storage, name), None
+            except Exception as e:  # one bad image (missing, corrupt, a decompression bomb) must not stop the rest
+                return pk, name, None, e
+
+        made = failed = 0
+        # Workers only touch files; rows are saved here, on the command's own connection
+        for pk, name, variants, error in executor.map(render, pending):
+            if error is not None:
+                failed += 1
+                self.stderr.write(f"{model.__name__} {pk}: could not process {name}: {error}")
+                continue
+            made += save_variants(model, pk, field_name, name, variants)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{model.__name__}.{field_name}: made variants for {made} images, {failed} failed"
+        ))
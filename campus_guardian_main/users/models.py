@@ -18,6 +18,7 @@ class User(models.Model):
     is_active = models.BooleanField(default=True)
     username = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)  # see campus_guardian_main/images.py
 
     def get_full_name(self):
         if self.last_name:
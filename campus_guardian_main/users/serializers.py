@@ -1,10 +1,12 @@
 from rest_framework import serializers
+from ..images import variant_urls
 from .models import User, Login
 
 class UserWithLoginSerializer(serializers.ModelSerializer):
     username = serializers.CharField(write_only=True, required=True)
     password = serializers.CharField(write_only=True, required=True)
     full_name = serializers.SerializerMethodField(read_only=True)
+    profile_picture_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -19,14 +21,18 @@ class UserWithLoginSerializer(serializers.ModelSerializer):
             'address',
             'is_active',
             'profile_picture',
+            'profile_picture_variants',
             'username',
             'password',
         ]
-        read_only_fields = ['id', 'full_name']
+        read_only_fields = ['id', 'full_name', 'profile_picture_variants']
 
     def get_full_name(self, obj):
         return obj.get_full_name()
 
+    def get_profile_picture_variants(self, obj):
+        return variant_urls(obj.profile_picture, obj.profile_picture_variants, self.context.get('request'))
+
     def validate_email(self, value):
         if User.objects.filter(email__iexact=value).exists():
             raise serializers.ValidationError("Email is already in use.")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VisitorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'campus_guardian_main.visitors'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['check_in'], name='visitors_check_i_77fcff_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitors', '0002_visitor_visitors_check_i_77fcff_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -23,6 +23,7 @@ class Visitor(models.Model):
     whom_to_meet = models.CharField(max_length=100, blank=True, null=True)
     purpose = models.TextField()
     photo = models.ImageField(upload_to='visitor_photos/')
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)  # see campus_guardian_main/images.py
     id_proof = models.FileField(upload_to='visitor_ids/', null=True, blank=True)
     check_in = models.DateTimeField(default=timezone.now)
     check_out = models.DateTimeField(null=True, blank=True)
@@ -34,4 +35,7 @@ class Visitor(models.Model):
 
     class Meta:
         db_table = 'visitors'
-        ordering = ['-check_in']
\ No newline at end of file
+        ordering = ['-check_in']
+        indexes = [
+            models.Index(fields=['check_in']),
+        ]
\ No newline at end of file
@@ -1,16 +1,21 @@
 from rest_framework import serializers
+from ..images import variant_urls
 from .models import Visitor
 
 
 class VisitorSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     visitor_type_display = serializers.CharField(source='get_visitor_type_display', read_only=True)
+    photo_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Visitor
         fields = '__all__'
         read_only_fields = ['check_in', 'check_out', 'host']
 
+    def get_photo_variants(self, obj):
+        return variant_urls(obj.photo, obj.photo_variants, self.context.get('request'))
+
 
 # class VisitorCreateSerializer(serializers.ModelSerializer):
 #     class Meta:
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from ..images import schedule_variants
+from .models import Visitor
+
+
+@receiver(post_save, sender=Visitor)
+def make_photo_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'photo')
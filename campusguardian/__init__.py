@@ -1,4 +1,2 @@
 import pymysql
 pymysql.install_as_MySQLdb()
-
-default_app_config = 'campus_guardian_main.management.apps.AttendanceConfig'
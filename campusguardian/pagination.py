@@ -0,0 +1,118 @@
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination keyed on a model's natural time column plus ``id``.
+
+    DRF's CursorPagination only keys on the first ordering field and uses an
+    offset to step over rows sharing a value, which degrades on columns like
+    ``Attendance.date`` where thousands of rows share a day. Here the cursor
+    holds ``(value, id)`` and each page is fetched with a row-value comparison,
+    so every page costs the same single indexed range query.
+
+    Views can set ``cursor_ordering`` (e.g. ``('-timestamp', '-id')``); otherwise
+    the first of ``time_fields`` found on the model is used, falling back to ``id``.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 500)
+    time_fields = ('timestamp', 'check_in', 'created_at', 'date')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering is None:
+            field_names = {field.name for field in queryset.model._meta.concrete_fields}
+            time_field = next((name for name in self.time_fields if name in field_names), None)
+            ordering = (f'-{time_field}', '-id') if time_field else ('-id',)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.cursor.position if self.cursor else None
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if position is not None:
+            queryset = queryset.filter(self._after_position(position, reverse))
+
+        # Fetch one extra row to tell whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > len(self.page)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        if self.page:
+            self.next_position = self._get_position_from_instance(self.page[-1], self.ordering)
+            self.previous_position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            self.next_position = self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def _after_position(self, position, reverse):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Build (a, b) > (x, y) as a > x OR (a = x AND b > y)
+        condition = Q()
+        equal_so_far = Q()
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            descending = order.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal_so_far & Q(**{f'{field}__{lookup}': value})
+            equal_so_far &= Q(**{field: value})
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            value = instance[field_name] if isinstance(instance, dict) else getattr(instance, field_name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return json.dumps(values)
+
+
+def _reverse_ordering(ordering):
+    return tuple(order[1:] if order.startswith('-') else f'-{order}' for order in ordering)
@@ -48,14 +48,129 @@ INSTALLED_APPS = [
     'campus_guardian_main.users',
     'campus_guardian_main.notifications',
     'campus_guardian_main.alerts',
+    'campus_guardian_main.scheduler',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [],  # No auth
     'DEFAULT_PERMISSION_CLASSES': [],
     'UNAUTHENTICATED_USER': None,
+    'DEFAULT_PAGINATION_CLASS': 'campusguardian.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
+# Upper bound for the ?page_size= a client may request on list endpoints
+PAGINATION_MAX_PAGE_SIZE = 500
+
+# Largest batch accepted by POST /api/bus_tracker/gpslogs/ingest/
+GPS_INGEST_MAX_BATCH = 5000
+
+# Fix filtering on ingestion: fixes implying more than GPS_FILTER_MAX_SPEED_KMH,
+# repeating a timestamp or dated over GPS_FILTER_MAX_FUTURE_SECONDS ahead of the
+# server clock are rejected, and fixes within GPS_FILTER_JITTER_M of the last
+# one are dropped unless GPS_FILTER_KEEPALIVE_SECONDS have passed.
+# GPS_FILTER_SMOOTHING (0-1) enables exponential smoothing; None disables it.
+# The last fix of up to GPS_FILTER_CACHE_SIZE buses is kept in memory.
+GPS_FILTER_MAX_SPEED_KMH = 120
+GPS_FILTER_JITTER_M = 10
+GPS_FILTER_KEEPALIVE_SECONDS = 60
+GPS_FILTER_MAX_FUTURE_SECONDS = 5 * 60
+GPS_FILTER_SMOOTHING = None
+GPS_FILTER_CACHE_SIZE = 1024
+
+# Sync feed for the driver app: at most SYNC_MAX_CHANGES change log rows are
+# read per request, and rows older than SYNC_CHANGE_LOG_DAYS are pruned nightly
+# (clients holding an older token get a full snapshot, SYNC_SNAPSHOT_PAGE_SIZE
+# objects per page). Changes are only handed out once SYNC_SETTLE_SECONDS old,
+# so one committed late is never skipped; keep it above the clock skew between
+# app servers.
+SYNC_MAX_CHANGES = 5000
+SYNC_CHANGE_LOG_DAYS = 30
+SYNC_SNAPSHOT_PAGE_SIZE = 500
+SYNC_SETTLE_SECONDS = 5
+
+# Photo variants (campus_guardian_main/images.py): longest side in pixels per
+# variant, output format and quality. Uploads are processed by IMAGE_WORKERS
+# background threads after the request commits; 0 processes them inline.
+IMAGE_VARIANT_SIZES = {'thumb': 128, 'medium': 512}
+IMAGE_VARIANT_FORMAT = 'WEBP'
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_WORKERS = 2
+
+# Where the latest position of each bus is kept for /api/bus_tracker/live/.
+# BUS_LIVE_CACHE must be shared by every worker: the database cache below
+# (create its table with `manage.py createcachetable`) or Redis/memcached.
+# LocalLiveBackend is per process and only fits a single worker. Positions
+# updated BUS_LIVE_SINCE_OVERLAP_SECONDS before ?since= are sent again.
+BUS_LIVE_BACKEND = 'campus_guardian_main.bus_tracker.live.CacheLiveBackend'
+BUS_LIVE_CACHE = 'live'
+BUS_LIVE_SINCE_OVERLAP_SECONDS = 2
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'live': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'bus_live_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},  # one entry per bus; culling would drop positions
+    },
+}
+
+# /api/bus_tracker/nearby/ buckets live positions into BUS_GRID_CELL_M cells,
+# rebuilt from the live store every BUS_GRID_REFRESH_SECONDS.
+BUS_GRID_CELL_M = 500
+BUS_GRID_REFRESH_SECONDS = 30
+
+# GPS retention: raw fixes are kept for GPS_RAW_RETENTION_DAYS, then thinned
+# to one point per GPS_DOWNSAMPLE_SECONDS or per GPS_DOWNSAMPLE_MIN_DISTANCE_M
+# of movement (None disables either rule) and moved to GPSTrackPoint.
+GPS_RAW_RETENTION_DAYS = 7
+GPS_DOWNSAMPLE_SECONDS = 60
+GPS_DOWNSAMPLE_MIN_DISTANCE_M = 50
+GPS_COMPACTION_BATCH_SIZE = 5000
+
+# Campus boundaries as lists of (latitude, longitude) vertices. When set, the
+# server derives GPSLog.log_type and Bus.location_status from coordinates;
+# a bus changes side after GEOFENCE_CONFIRM_FIXES consecutive fixes.
+CAMPUS_GEOFENCES = []
+GEOFENCE_CONFIRM_FIXES = 2
+GEOFENCE_BANDS = 32
+
+# Stop arrival detection: a StopTime is marked arrived when its bus reports a
+# fix within STOP_ARRIVAL_RADIUS_M of the stop (coordinates come from
+# RouteStop latitude/longitude). Only the next STOP_MATCH_LOOKAHEAD stops of the
+# running schedule are checked; cached stop lists are refreshed every
+# STOP_INDEX_TTL_SECONDS.
+STOP_ARRIVAL_RADIUS_M = 50
+STOP_MATCH_LOOKAHEAD = 3
+STOP_INDEX_TTL_SECONDS = 60
+STOP_MATCH_SCHEDULE_GRACE_MINUTES = 30
+
+# Predicted arrivals: StopDelayStat is rebuilt nightly from ETA_HISTORY_DAYS of
+# arrivals (delays clipped to ETA_MAX_DELAY_MINUTES). Hour buckets with fewer
+# than ETA_MIN_SAMPLES arrivals fall back to the stop's all-day average.
+ETA_HISTORY_DAYS = 60
+ETA_MIN_SAMPLES = 3
+ETA_MAX_DELAY_MINUTES = 60
+ETA_TABLE_RELOAD_SECONDS = 15 * 60
+
+# On-time analytics: an arrival counts as on time from ON_TIME_EARLY_MINUTES
+# early to ON_TIME_LATE_MINUTES late. Reports are cached until a stop in the
+# period changes, or for ON_TIME_CACHE_SECONDS at most. Changes are tracked in
+# the database, so this also holds with a per-process cache and several workers.
+ON_TIME_EARLY_MINUTES = 1
+ON_TIME_LATE_MINUTES = 5
+ON_TIME_CACHE_SECONDS = 6 * 60 * 60
+
+# Stop status sweep: upcoming stops with no arrival are marked skipped once
+# their trip ended STOP_SKIP_GRACE_MINUTES ago (at least
+# STOP_MATCH_SCHEDULE_GRACE_MINUTES, while late arrivals can still match);
+# stops scheduled in the last STOP_STATUS_LOOKBACK_HOURS that have an actual
+# arrival are marked arrived.
+STOP_SKIP_GRACE_MINUTES = 10
+STOP_STATUS_LOOKBACK_HOURS = 24
+
 MIDDLEWARE = [
     # 'django.middleware.security.SecurityMiddleware',
     # 'django.contrib.sessions.middleware.SessionMiddleware',  # This line is important for session management
@@ -77,8 +192,20 @@ MIDDLEWARE = [
 
 CRON_CLASSES = [
     "campus_guardian_main.management.cron.DailyAttendanceAutoCreate",
+    "campus_guardian_main.bus_tracker.cron.GPSLogCompaction",
+    "campus_guardian_main.bus_tracker.cron.StopDelayStatsRefresh",
+    "campus_guardian_main.bus_tracker.cron.StopStatusSweep",
+    "campus_guardian_main.bus_tracker.cron.ChangeLogPrune",
+    "campus_guardian_main.scheduler.cron.JobRunPrune",
 ]
 
+# Jobs above are run by `python manage.py run_scheduler` in its own process
+SCHEDULER_LEASE_SECONDS = 15 * 60  # a job lease expires if its holder dies
+SCHEDULER_MAX_CATCH_UP = 7  # missed slots replayed after downtime
+SCHEDULER_POLL_SECONDS = 30
+SCHEDULER_MAX_ATTEMPTS = 3  # runs of a failing slot before it is given up
+SCHEDULER_RUN_RETENTION_DAYS = 30  # run history kept by JobRunPrune
+
 
 CORS_ALLOW_ALL_ORIGINS = True
 